@@ -0,0 +1,128 @@
+"""
+Compara latência e pico de memória da leitura de uma página de livros pelo
+ORM, com joined load e identity map, e pelo repositório em SQLAlchemy Core,
+usando um SQLite em memória
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from datetime import date
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from madr.core.orm.mapping import (
+    author_table,
+    book_authorship_table,
+    book_table,
+    init_mappings,
+    meta,
+    remove_mappings,
+)
+from madr.models import Book
+from madr.repositories.books import fetch_books, select_books
+
+AUTHORS_PER_BOOK = 3
+
+
+async def seed(session: AsyncSession, rows: int) -> None:
+    await session.execute(
+        insert(author_table),
+        [
+            {
+                "id": index,
+                "name": f"romancista {index}",
+                "nationality": "brasileira",
+                "birth_date": date(1900, 1, 1),
+            }
+            for index in range(1, 101)
+        ],
+    )
+    await session.execute(
+        insert(book_table),
+        [
+            {"id": index, "isbn": None, "name": f"livro {index}", "year": 2000}
+            for index in range(1, rows + 1)
+        ],
+    )
+    await session.execute(
+        insert(book_authorship_table),
+        [
+            {"book_id": index, "author_id": (index + offset) % 100 + 1}
+            for index in range(1, rows + 1)
+            for offset in range(AUTHORS_PER_BOOK)
+        ],
+    )
+    await session.commit()
+
+
+async def orm_page(session: AsyncSession, rows: int) -> list:
+    query = select(Book).order_by(book_table.c.id).limit(rows)
+    return (await session.execute(query)).scalars().unique().all()
+
+
+async def core_page(session: AsyncSession, rows: int) -> list:
+    query = select_books().order_by(book_table.c.id).limit(rows)
+    return await fetch_books(session, query)
+
+
+async def measure(
+    session_maker: async_sessionmaker,
+    page: Callable[[AsyncSession, int], Awaitable[list]],
+    rows: int,
+    rounds: int,
+) -> tuple[float, float]:
+    """
+    Melhor tempo em milissegundos e pico de memória em KiB de uma página,
+    cada rodada com uma sessão nova para não reaproveitar o identity map
+    """
+    timings = []
+    for _ in range(rounds):
+        async with session_maker() as session:
+            start = time.perf_counter()
+            result = await page(session, rows)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert len(result) == rows
+
+    async with session_maker() as session:
+        tracemalloc.start()
+        await page(session, rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return min(timings), peak / 1024
+
+
+async def run(sizes: list[int], rounds: int) -> None:
+    init_mappings()
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(meta.create_all)
+    async with session_maker() as session:
+        await seed(session, max(sizes))
+
+    for rows in sizes:
+        for name, page in (("ORM", orm_page), ("Core", core_page)):
+            elapsed, peak = await measure(session_maker, page, rows, rounds)
+            print(f"{rows:>6} linhas {name:<5} {elapsed:9.2f} ms {peak:10.0f} KiB")
+
+    await engine.dispose()
+    remove_mappings()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    asyncio.run(run(args.rows, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
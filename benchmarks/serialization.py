@@ -0,0 +1,94 @@
+"""
+Compara o custo por linha da serialização antiga das listagens, que passava
+por dicionários, jsonable_encoder e json da stdlib, com o caminho atual pelo
+TypeAdapter do pydantic
+"""
+
+import argparse
+import json
+import timeit
+from collections.abc import Callable
+from datetime import date
+
+from fastapi.encoders import jsonable_encoder
+
+from madr.models import Author, Book
+from madr.schema import BookSchema
+from madr.utils.serialization import book_list_adapter, dump_json_list
+
+
+def make_books(count: int) -> list[Book]:
+    books = []
+    for index in range(count):
+        book = Book(
+            isbn="9780306406157",
+            name=f"livro numero {index}",
+            year=1900 + index % 120,
+            authors=[
+                Author(
+                    name="machado de assis",
+                    nationality="brasileira",
+                    birth_date=date(1839, 6, 21),
+                ),
+                Author(
+                    name="clarice lispector",
+                    nationality="brasileira",
+                    birth_date=date(1920, 12, 10),
+                ),
+            ],
+        )
+        book.id = index
+        books.append(book)
+    return books
+
+
+def legacy_pipeline(books: list[Book]) -> bytes:
+    return json.dumps(
+        jsonable_encoder(
+            [
+                BookSchema.model_validate(
+                    {
+                        **book.__dict__,
+                        "authors_names": [author.name for author in book.authors],
+                    },
+                    by_name=True,
+                )
+                for book in books
+            ]
+        ),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def adapter_pipeline(books: list[Book]) -> bytes:
+    return dump_json_list(book_list_adapter, books)
+
+
+def measure(pipeline: Callable[[list[Book]], bytes], books: list[Book], rounds: int):
+    """
+    Melhor tempo entre as rodadas, em microssegundos por linha
+    """
+    best = min(timeit.repeat(lambda: pipeline(books), number=1, repeat=rounds))
+    return best / len(books) * 1_000_000
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    books = make_books(args.rows)
+    assert json.loads(legacy_pipeline(books)) == json.loads(adapter_pipeline(books))
+
+    for name, pipeline in (
+        ("jsonable_encoder + json", legacy_pipeline),
+        ("TypeAdapter.dump_json", adapter_pipeline),
+    ):
+        per_row = measure(pipeline, books, args.rounds)
+        print(f"{name:<25} {per_row:8.2f} µs/linha")
+
+
+if __name__ == "__main__":
+    main()
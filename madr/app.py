@@ -1,23 +1,76 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from madr.routes import auth, authors, books
+from fastapi import FastAPI, Request
+from fastapi.exception_handlers import http_exception_handler
+from madr.routes import auth, authors, books, imports, metrics, status
 import uvicorn
 
+from madr.core.database import engine, replica_selector, warm_up_pool
+from madr.core.hashing import (
+    HashingSaturatedError,
+    get_dummy_hash,
+    shutdown_hashing_executor,
+)
+from madr.core.metrics import registry
 from madr.core.orm import init_mappings, remove_mappings
+from madr.core.settings import settings
+from madr.deps import get_i18n
+from madr.exceptions import ServiceUnavailableException
+from madr.middleware import (
+    ConditionalRequestMiddleware,
+    MetricsMiddleware,
+    QueryPatternMiddleware,
+    ReadYourWritesMiddleware,
+    ServerTimingMiddleware,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_mappings()
+    await asyncio.gather(
+        get_dummy_hash(),
+        *(
+            warm_up_pool(pooled_engine, settings.DATABASE_POOL_WARMUP)
+            for pooled_engine in [engine, *replica_selector.engines]
+        ),
+    )
     yield
     remove_mappings()
+    shutdown_hashing_executor()
+    registry.remove_snapshot()
+    for pooled_engine in [engine, *replica_selector.engines]:
+        await pooled_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(ConditionalRequestMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+if settings.SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+if settings.N_PLUS_ONE_THRESHOLD is not None:
+    app.add_middleware(QueryPatternMiddleware)
+
+
+@app.exception_handler(HashingSaturatedError)
+async def hashing_saturated_handler(request: Request, _: HashingSaturatedError):
+    return await http_exception_handler(
+        request,
+        ServiceUnavailableException(
+            i18n=get_i18n(request),
+            retry_after=settings.PASSWORD_HASHING_RETRY_AFTER,
+        ),
+    )
+
+
 app.include_router(auth.router)
 app.include_router(authors.router)
 app.include_router(books.router)
+app.include_router(imports.router)
+app.include_router(metrics.router)
+app.include_router(status.router)
 
 if __name__ == "__main__":
     uvicorn.run("app:app", reload=True)
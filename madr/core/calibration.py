@@ -0,0 +1,123 @@
+"""
+Escolhe os parâmetros do Argon2 para o hardware atual, mirando um tempo de
+hash por senha. Uso:
+
+    python -m madr.core.calibration --target-ms 250 --write-env .env
+"""
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+import secrets
+import statistics
+import time
+
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+# mínimo recomendado pela OWASP para o argon2id
+MIN_MEMORY_COST = 19 * 1024
+
+
+@dataclass(frozen=True)
+class Argon2Parameters:
+    time_cost: int
+    memory_cost: int
+    parallelism: int
+
+    def as_env(self) -> dict[str, str]:
+        return {
+            "ARGON2_TIME_COST": str(self.time_cost),
+            "ARGON2_MEMORY_COST": str(self.memory_cost),
+            "ARGON2_PARALLELISM": str(self.parallelism),
+        }
+
+
+def measure_hash_time(parameters: Argon2Parameters, rounds: int = 3) -> float:
+    """
+    Mediana em milissegundos do tempo de hash com os parâmetros
+    """
+    hasher = Argon2Hasher(
+        time_cost=parameters.time_cost,
+        memory_cost=parameters.memory_cost,
+        parallelism=parameters.parallelism,
+    )
+    password = secrets.token_urlsafe(16)
+
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash(password)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(durations)
+
+
+def calibrate(
+    target_ms: float, max_memory_cost: int, parallelism: int
+) -> Argon2Parameters:
+    """
+    Prioriza memória, que é o que encarece ataques com GPU: reduz a memória
+    até uma passada caber no alvo e depois aumenta as passadas enquanto
+    couberem
+    """
+    parameters = Argon2Parameters(1, max_memory_cost, parallelism)
+
+    while (
+        parameters.memory_cost > MIN_MEMORY_COST
+        and measure_hash_time(parameters) > target_ms
+    ):
+        parameters = Argon2Parameters(
+            1, max(parameters.memory_cost // 2, MIN_MEMORY_COST), parallelism
+        )
+
+    while True:
+        candidate = Argon2Parameters(
+            parameters.time_cost + 1, parameters.memory_cost, parallelism
+        )
+        if measure_hash_time(candidate) > target_ms:
+            return parameters
+        parameters = candidate
+
+
+def write_env_file(path: Path, parameters: Argon2Parameters) -> None:
+    """
+    Atualiza os parâmetros no arquivo .env lido pelas configurações,
+    mantendo as demais variáveis
+    """
+    values = parameters.as_env()
+    lines = path.read_text().splitlines() if path.exists() else []
+
+    updated_lines = []
+    for line in lines:
+        key = line.split("=", 1)[0].strip()
+        updated_lines.append(f"{key}={values.pop(key)}" if key in values else line)
+
+    updated_lines.extend(f"{key}={value}" for key, value in values.items())
+    path.write_text("\n".join(updated_lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--max-memory-mib", type=int, default=256)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--write-env", type=Path)
+    args = parser.parse_args()
+
+    parameters = calibrate(
+        target_ms=args.target_ms,
+        max_memory_cost=args.max_memory_mib * 1024,
+        parallelism=args.parallelism,
+    )
+    elapsed = measure_hash_time(parameters)
+
+    for key, value in parameters.as_env().items():
+        print(f"{key}={value}")
+    print(f"# {elapsed:.0f} ms por hash")
+
+    if args.write_env:
+        write_env_file(args.write_env, parameters)
+
+
+if __name__ == "__main__":
+    main()
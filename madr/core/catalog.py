@@ -0,0 +1,80 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.database import dialect_insert
+from madr.core.orm.mapping import catalog_version_table
+from madr.utils.caching import make_weak_etag, response_cache
+
+AUTHOR_CATALOG = "author"
+BOOK_CATALOG = "book"
+
+# catálogos alterados pela requisição atual, preenchido só quando há réplicas
+catalog_writes: ContextVar[set[str] | None] = ContextVar("catalog_writes", default=None)
+
+
+@dataclass(frozen=True)
+class CatalogVersion:
+    name: str
+    version: int
+    updated_at: datetime
+
+    def etag(self, *parts: Any) -> str:
+        return make_weak_etag(self.name, self.version, *parts)
+
+
+async def get_catalog_version(
+    session: AsyncSession, name: str
+) -> CatalogVersion | None:
+    """
+    Versão atual de um catálogo, consultada pela chave primária da tabela
+    catalog_version em vez de agregar a tabela do catálogo inteira
+    """
+    row = (
+        await session.execute(
+            select(
+                catalog_version_table.c.version, catalog_version_table.c.updated_at
+            ).filter(catalog_version_table.c.name == name)
+        )
+    ).one_or_none()
+
+    if not row:
+        return None
+
+    updated_at = row.updated_at
+    # o SQLite descarta o fuso horário ao armazenar
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=ZoneInfo("UTC"))
+
+    return CatalogVersion(name=name, version=row.version, updated_at=updated_at)
+
+
+async def bump_catalog_version(session: AsyncSession, *names: str) -> None:
+    """
+    Incrementa a versão dos catálogos na mesma transação da escrita e
+    descarta as respostas em cache deles, deve ser chamada antes do commit em
+    toda criação, atualização ou remoção
+    """
+    now = datetime.now(tz=ZoneInfo("UTC"))
+
+    query = dialect_insert(session, catalog_version_table).values(
+        [{"name": name, "version": 1, "updated_at": now} for name in names]
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[catalog_version_table.c.name],
+        set_={
+            "version": catalog_version_table.c.version + 1,
+            "updated_at": query.excluded.updated_at,
+        },
+    )
+
+    await session.execute(query)
+
+    response_cache.invalidate(*names)
+    if (writes := catalog_writes.get()) is not None:
+        writes.update(names)
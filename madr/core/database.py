@@ -1,17 +1,199 @@
-from collections.abc import AsyncGenerator
+import asyncio
+from collections.abc import AsyncGenerator, Sequence
+import itertools
+import logging
 from typing import Any
+import time
+from psycopg import sql
+from sqlalchemy import Table, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .instrumentation import instrument_engine
+from .metrics import db_pool_wait
 from .settings import settings
 
-engine = create_async_engine(settings.DATABASE_URI.get_secret_value())
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool que registra quanto cada checkout esperou por uma conexão livre
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start)
+
+
+def create_pooled_engine(uri: str) -> AsyncEngine:
+    # criar o engine não abre conexões, elas são abertas em `warm_up_pool`
+    engine = create_async_engine(
+        uri,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    )
+    instrument_engine(engine)
+    return engine
+
+
+engine = create_pooled_engine(settings.DATABASE_URI.get_secret_value())
 
 session_maker = async_sessionmaker(engine)
 
 
+class ReplicaSelector:
+    """
+    Escolhe a réplica com menos conexões em uso, alternando entre as
+    empatadas para distribuir a carga quando estão todas ociosas
+    """
+
+    def __init__(self, session_makers: Sequence[async_sessionmaker[AsyncSession]]):
+        self.session_makers = list(session_makers)
+        self._turn = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.session_makers)
+
+    def choose(self) -> async_sessionmaker[AsyncSession]:
+        start = next(self._turn)
+        rotated = [
+            self.session_makers[(start + i) % len(self.session_makers)]
+            for i in range(len(self.session_makers))
+        ]
+        return min(
+            rotated,
+            key=lambda maker: get_pool_stats(maker.kw["bind"]).get("checkedout", 0),
+        )
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        return [maker.kw["bind"] for maker in self.session_makers]
+
+
+replica_selector = ReplicaSelector(
+    [
+        async_sessionmaker(create_pooled_engine(uri.get_secret_value()))
+        for uri in settings.DATABASE_REPLICA_URIS
+    ]
+)
+
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, Any]:
     async with session_maker() as session:
         yield session
+
+
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    """
+    Para tarefas que continuam depois da resposta e precisam de sessões próprias
+    """
+    return session_maker
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict[str, int]:
+    """
+    Estado do pool de conexões, vazio para pools sem limite como o StaticPool
+    """
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {}
+
+    return {
+        "size": pool.size(),
+        "checkedin": pool.checkedin(),
+        "checkedout": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    """
+    Abre as conexões ao mesmo tempo e as devolve ao pool, uma falha só é
+    registrada, a prontidão da aplicação é informada por /status/pronto
+    """
+    # conexões além do tamanho do pool seriam fechadas ao serem devolvidas
+    connections = min(connections, get_pool_stats(engine).get("size", 1))
+    if connections <= 0:
+        return
+
+    barrier = asyncio.Barrier(connections)
+
+    async def connect() -> None:
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+                # mantém a conexão em uso até todas as outras serem abertas
+                await barrier.wait()
+        except BaseException:
+            await barrier.abort()
+            raise
+
+    results = await asyncio.gather(
+        *(connect() for _ in range(connections)), return_exceptions=True
+    )
+    if errors := [
+        result
+        for result in results
+        if isinstance(result, BaseException)
+        and not isinstance(result, asyncio.BrokenBarrierError)
+    ]:
+        logger.warning(
+            "não foi possível aquecer o pool de conexões", exc_info=errors[0]
+        )
+
+
+def get_dialect_name(session: AsyncSession) -> str:
+    return session.get_bind().dialect.name
+
+
+_dialect_inserts = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(session: AsyncSession, table: Table):
+    """
+    INSERT específico do banco da sessão, que suporta ON CONFLICT
+    """
+    return _dialect_inserts[get_dialect_name(session)](table)
+
+
+async def copy_rows(
+    session: AsyncSession,
+    table: Table,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+) -> None:
+    """
+    Carrega linhas em uma tabela pelo COPY do Postgres, na transação da
+    sessão, nos outros bancos usa um INSERT em lote
+    """
+    if not rows:
+        return
+
+    if get_dialect_name(session) != "postgresql":
+        await session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+        return
+
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table.name),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+    )
+
+    async with raw_connection.driver_connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for row in rows:
+                await copy.write_row(row)
@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import os
+import time
+
+from madr.core.instrumentation import timed
+from madr.core.metrics import password_hashing_duration
+from madr.core.security import hash_password, verify_password_hash
+from madr.core.settings import settings
+
+_executor: Executor | None = None
+_dummy_hash: str | None = None
+
+
+class HashingSaturatedError(Exception): ...
+
+
+class HashingQueue:
+    """
+    Limita quantas operações de hash rodam ao mesmo tempo e quantas podem
+    esperar por uma vaga, recusando imediatamente as que excedem a fila
+    """
+
+    def __init__(self, concurrency: int, max_waiting: int) -> None:
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            raise HashingSaturatedError()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+hashing_queue = HashingQueue(
+    concurrency=settings.PASSWORD_HASHING_CONCURRENCY or os.cpu_count() or 1,
+    max_waiting=settings.PASSWORD_HASHING_QUEUE_DEPTH,
+)
+
+
+def get_hashing_executor() -> Executor:
+    """
+    Executor onde o Argon2 roda, fora do event loop. Threads bastam na maior
+    parte dos casos, já que o argon2-cffi libera a GIL durante o hash
+    """
+    global _executor
+
+    if _executor is None:
+        if settings.PASSWORD_HASHING_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="argon2",
+            )
+
+    return _executor
+
+
+def shutdown_hashing_executor() -> None:
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+@contextmanager
+def measured(operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        password_hashing_duration.observe(time.perf_counter() - start, operation)
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    with timed("hash"), measured("hash"):
+        async with hashing_queue.slot():
+            return await loop.run_in_executor(
+                get_hashing_executor(), hash_password, password
+            )
+
+
+async def verify_password_hash_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    loop = asyncio.get_running_loop()
+    with timed("hash"), measured("verify"):
+        async with hashing_queue.slot():
+            return await loop.run_in_executor(
+                get_hashing_executor(),
+                verify_password_hash,
+                plain_password,
+                hashed_password,
+            )
+
+
+async def get_dummy_hash() -> str:
+    """
+    Hash calculado uma única vez e verificado quando o usuário não existe,
+    para que o login leve o mesmo tempo nos dois casos
+    """
+    global _dummy_hash
+
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password_async("a" * 10)
+
+    return _dummy_hash
@@ -0,0 +1,456 @@
+import asyncio
+import csv
+import io
+from collections.abc import Awaitable, Callable, Iterator, Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, TypeVar, get_origin
+from uuid import UUID, uuid4
+from zoneinfo import ZoneInfo
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import (
+    Column,
+    Date,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    insert,
+    select,
+    true,
+    update,
+)
+from fastapi import BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from madr.core.catalog import AUTHOR_CATALOG, BOOK_CATALOG, bump_catalog_version
+from madr.core.database import copy_rows, dialect_insert
+from madr.core.orm.mapping import (
+    author_table,
+    book_authorship_table,
+    book_table,
+    import_job_table,
+)
+from madr.core.settings import settings
+from madr.schema import AuthorCreate, BookCreate, ImportStatus
+from madr.utils.serialization import FileFormat
+
+M = TypeVar("M", bound=BaseModel)
+
+# tabelas de carga, temporárias e exclusivas de cada conexão
+staging_meta = MetaData()
+
+book_staging_table = Table(
+    "import_book",
+    staging_meta,
+    Column("line", Integer, primary_key=True),
+    Column("isbn", String),
+    Column("name", String, nullable=False),
+    Column("year", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+author_staging_table = Table(
+    "import_author",
+    staging_meta,
+    Column("line", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("nationality", String, nullable=False),
+    Column("birth_date", Date, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+class InvalidFileError(ValueError): ...
+
+
+@dataclass(frozen=True)
+class ImportConflict:
+    line: int
+    reason: str
+
+
+@dataclass
+class ImportJob:
+    entity: str
+    # só é conhecido depois que o arquivo é lido
+    total: int | None = None
+    id: UUID = field(default_factory=uuid4)
+    status: ImportStatus = "pending"
+    processed: int = 0
+    inserted: int = 0
+    conflicts: list[ImportConflict] = field(default_factory=list)
+
+
+def _job_values(job: ImportJob) -> dict[str, Any]:
+    return {
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "inserted": job.inserted,
+        "conflicts": [asdict(conflict) for conflict in job.conflicts],
+        "updated_at": datetime.now(tz=ZoneInfo("UTC")),
+    }
+
+
+async def create_job(
+    session_maker: async_sessionmaker[AsyncSession], job: ImportJob
+) -> None:
+    """
+    Registra o job e remove os já encerrados há mais de IMPORT_JOB_TTL
+    """
+    expired_at = datetime.now(tz=ZoneInfo("UTC")) - timedelta(
+        seconds=settings.IMPORT_JOB_TTL
+    )
+
+    async with session_maker() as session:
+        await session.execute(
+            delete(import_job_table).filter(
+                import_job_table.c.status.in_(["finished", "failed"]),
+                import_job_table.c.updated_at < expired_at,
+            )
+        )
+        await session.execute(
+            insert(import_job_table).values(
+                id=job.id, entity=job.entity, **_job_values(job)
+            )
+        )
+        await session.commit()
+
+
+async def save_job(session: AsyncSession, job: ImportJob) -> None:
+    await session.execute(
+        update(import_job_table)
+        .filter(import_job_table.c.id == job.id)
+        .values(_job_values(job))
+    )
+
+
+async def get_job(session: AsyncSession, id: UUID) -> ImportJob | None:
+    row = (
+        await session.execute(
+            select(import_job_table).filter(import_job_table.c.id == id)
+        )
+    ).one_or_none()
+
+    if not row:
+        return None
+
+    return ImportJob(
+        entity=row.entity,
+        total=row.total,
+        id=row.id,
+        status=row.status,
+        processed=row.processed,
+        inserted=row.inserted,
+        conflicts=[ImportConflict(**conflict) for conflict in row.conflicts],
+    )
+
+
+def _read_records(content: bytes, format: FileFormat) -> Iterator[tuple[int, Any]]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise InvalidFileError(format)
+
+    if format == "ndjson":
+        for line, raw in enumerate(text.splitlines(), start=1):
+            if raw.strip():
+                yield line, raw
+        return
+
+    reader = csv.DictReader(io.StringIO(text))
+    try:
+        for record in reader:
+            yield reader.line_num, record
+    except csv.Error:
+        raise InvalidFileError(format)
+
+
+def _from_csv(schema: type[BaseModel], record: dict[str, str]) -> dict[str, Any]:
+    # listas são exportadas separadas por ponto e vírgula
+    for name, model_field in schema.model_fields.items():
+        key = model_field.alias or name
+        if get_origin(model_field.annotation) is list and key in record:
+            record[key] = [item for item in record[key].split(";") if item.strip()]
+    return record
+
+
+def parse_import(
+    schema: type[M],
+    content: bytes,
+    format: FileFormat,
+    i18n: Mapping[str, Any],
+) -> tuple[list[tuple[int, M]], list[ImportConflict]]:
+    """
+    Valida as linhas de um arquivo de importação, com os nomes já
+    sanitizados pelo schema, e descarta as repetidas dentro do próprio arquivo
+    """
+    rows: list[tuple[int, M]] = []
+    conflicts: list[ImportConflict] = []
+    seen_names: set[str] = set()
+
+    for line, record in _read_records(content, format):
+        try:
+            if format == "ndjson":
+                row = schema.model_validate_json(record)
+            else:
+                row = schema.model_validate(_from_csv(schema, record))
+        except ValidationError as e:
+            details = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            )
+            conflicts.append(
+                ImportConflict(line, i18n["exceptions"]["invalid_row"].format(details))
+            )
+            continue
+
+        if row.name in seen_names:
+            conflicts.append(
+                ImportConflict(line, i18n["exceptions"]["duplicated"].format(row.name))
+            )
+            continue
+
+        seen_names.add(row.name)
+        rows.append((line, row))
+
+    return rows, conflicts
+
+
+async def _stage(
+    session: AsyncSession, staging_table: Table, rows: Sequence[Sequence[Any]]
+) -> None:
+    connection = await session.connection()
+    await connection.run_sync(staging_table.create)
+    await copy_rows(
+        session, staging_table, [column.name for column in staging_table.c], rows
+    )
+
+
+async def _merge(
+    session: AsyncSession, table: Table, staging_table: Table, columns: Sequence[str]
+) -> dict[str, int]:
+    """
+    Insere as linhas da tabela de carga que não conflitam com nenhuma
+    restrição única e retorna os ids gerados indexados pelo nome
+    """
+    # o WHERE evita a ambiguidade do SQLite entre ON CONFLICT e um JOIN ... ON
+    source = select(*(staging_table.c[column] for column in columns)).where(true())
+    query = (
+        dialect_insert(session, table)
+        .from_select(columns, source.order_by(staging_table.c.line))
+        .on_conflict_do_nothing()
+        .returning(table.c.id, table.c.name)
+    )
+    inserted = {name: id for id, name in await session.execute(query)}
+
+    connection = await session.connection()
+    await connection.run_sync(staging_table.drop)
+
+    return inserted
+
+
+async def merge_books(
+    session: AsyncSession,
+    job: ImportJob,
+    rows: Sequence[tuple[int, BookCreate]],
+    i18n: Mapping[str, Any],
+) -> None:
+    requested_ids = {author_id for _, row in rows for author_id in row.author_ids}
+    existing_ids = set(
+        (
+            await session.execute(
+                select(author_table.c.id).filter(author_table.c.id.in_(requested_ids))
+            )
+        ).scalars()
+    )
+
+    valid_rows = []
+    for line, row in rows:
+        if missing := [id for id in row.author_ids if id not in existing_ids]:
+            reason = i18n["exceptions"]["missing_related"].format(
+                i18n["entities"]["author"], missing
+            )
+            job.conflicts.append(ImportConflict(line, reason))
+        else:
+            valid_rows.append((line, row))
+
+    await _stage(
+        session,
+        book_staging_table,
+        [(line, row.isbn, row.name, row.year) for line, row in valid_rows],
+    )
+    inserted = await _merge(
+        session, book_table, book_staging_table, ["isbn", "name", "year"]
+    )
+
+    authorships = []
+    for line, row in valid_rows:
+        if row.name not in inserted:
+            reason = i18n["exceptions"]["conflict"].format(i18n["entities"]["book"])
+            job.conflicts.append(ImportConflict(line, reason))
+            continue
+        authorships.extend(
+            # ids repetidos violariam a chave primária do vínculo
+            (inserted[row.name], author_id)
+            for author_id in dict.fromkeys(row.author_ids)
+        )
+
+    await copy_rows(
+        session, book_authorship_table, ["book_id", "author_id"], authorships
+    )
+
+    if inserted:
+        await bump_catalog_version(session, BOOK_CATALOG)
+    job.inserted += len(inserted)
+
+
+async def merge_authors(
+    session: AsyncSession,
+    job: ImportJob,
+    rows: Sequence[tuple[int, AuthorCreate]],
+    i18n: Mapping[str, Any],
+) -> None:
+    await _stage(
+        session,
+        author_staging_table,
+        [(line, row.name, row.nationality, row.birth_date) for line, row in rows],
+    )
+    inserted = await _merge(
+        session,
+        author_table,
+        author_staging_table,
+        ["name", "nationality", "birth_date"],
+    )
+
+    for line, row in rows:
+        if row.name not in inserted:
+            reason = i18n["exceptions"]["conflict"].format(i18n["entities"]["author"])
+            job.conflicts.append(ImportConflict(line, reason))
+
+    if inserted:
+        await bump_catalog_version(session, AUTHOR_CATALOG)
+    job.inserted += len(inserted)
+
+
+MergeBatch = Callable[
+    [AsyncSession, ImportJob, Sequence[tuple[int, Any]], Mapping[str, Any]],
+    Awaitable[None],
+]
+
+
+async def run_import(
+    job: ImportJob,
+    rows: Sequence[tuple[int, Any]],
+    merge_batch: MergeBatch,
+    session_maker: async_sessionmaker[AsyncSession],
+    i18n: Mapping[str, Any],
+) -> None:
+    """
+    Carrega as linhas em lotes, cada um em sua própria transação junto com o
+    progresso do job
+    """
+    job.status = "running"
+    job.processed = job.total - len(rows)
+
+    try:
+        for start in range(0, len(rows), settings.IMPORT_BATCH_SIZE):
+            batch = rows[start : start + settings.IMPORT_BATCH_SIZE]
+
+            async with session_maker() as session:
+                await merge_batch(session, job, batch, i18n)
+                job.processed += len(batch)
+                await save_job(session, job)
+                await session.commit()
+    except Exception:
+        job.status = "failed"
+        async with session_maker() as session:
+            await save_job(session, job)
+            await session.commit()
+        raise
+
+    job.conflicts.sort(key=lambda conflict: conflict.line)
+    job.status = "finished"
+    async with session_maker() as session:
+        await save_job(session, job)
+        await session.commit()
+
+
+async def _parse_in_executor(
+    schema: type[BaseModel],
+    content: bytes,
+    format: FileFormat,
+    i18n: Mapping[str, Any],
+) -> tuple[list[tuple[int, Any]], list[ImportConflict]]:
+    # a validação de arquivos grandes bloquearia o event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, parse_import, schema, content, format, i18n)
+
+
+async def parse_and_run_import(
+    job: ImportJob,
+    schema: type[BaseModel],
+    merge_batch: MergeBatch,
+    content: bytes,
+    format: FileFormat,
+    session_maker: async_sessionmaker[AsyncSession],
+    i18n: Mapping[str, Any],
+) -> None:
+    try:
+        rows, conflicts = await _parse_in_executor(schema, content, format, i18n)
+    except InvalidFileError:
+        job.status = "failed"
+        job.conflicts = [
+            ImportConflict(0, i18n["exceptions"]["invalid_file"].format(format))
+        ]
+        async with session_maker() as session:
+            await save_job(session, job)
+            await session.commit()
+        return
+
+    job.total = len(rows) + len(conflicts)
+    job.conflicts = conflicts
+    await run_import(job, rows, merge_batch, session_maker, i18n)
+
+
+async def start_import(
+    entity: str,
+    schema: type[BaseModel],
+    merge_batch: MergeBatch,
+    content: bytes,
+    format: FileFormat,
+    session_maker: async_sessionmaker[AsyncSession],
+    background_tasks: BackgroundTasks,
+    i18n: Mapping[str, Any],
+) -> ImportJob:
+    """
+    Registra o job de importação de um arquivo e o executa na própria
+    requisição quando é pequeno, ou lê e carrega o arquivo em segundo plano
+    depois da resposta
+    """
+    job = ImportJob(entity=entity)
+
+    # contar as quebras de linha é barato e limita as linhas do arquivo
+    if content.count(b"\n") + 1 > settings.IMPORT_SYNC_MAX_ROWS:
+        await create_job(session_maker, job)
+        background_tasks.add_task(
+            parse_and_run_import,
+            job,
+            schema,
+            merge_batch,
+            content,
+            format,
+            session_maker,
+            i18n,
+        )
+        return job
+
+    rows, job.conflicts = await _parse_in_executor(schema, content, format, i18n)
+    job.total = len(rows) + len(job.conflicts)
+    await create_job(session_maker, job)
+    await run_import(job, rows, merge_batch, session_maker, i18n)
+
+    return job
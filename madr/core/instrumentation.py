@@ -0,0 +1,115 @@
+import logging
+import re
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from madr.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestTimings:
+    """
+    Tempo gasto em cada etapa de uma requisição, em milissegundos
+    """
+
+    statements: int = 0
+    durations: defaultdict[str, float] = field(
+        default_factory=lambda: defaultdict(float)
+    )
+
+    def server_timing(self) -> str:
+        metrics = [f'db;dur={self.durations["db"]:.2f};desc="{self.statements}"']
+        metrics.extend(
+            f"{name};dur={duration:.2f}"
+            for name, duration in self.durations.items()
+            if name != "db"
+        )
+        return ", ".join(metrics)
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+# comandos da requisição atual, só registrados no modo de desenvolvimento
+request_statements: ContextVar[list[str] | None] = ContextVar(
+    "request_statements", default=None
+)
+
+_placeholder_lists = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|\$\d+)\s*,?)+\)")
+
+
+def get_statement_shape(statement: str) -> str:
+    """
+    Forma do comando, sem a quantidade de parâmetros das listas do IN
+    """
+    return _placeholder_lists.sub("(?)", " ".join(statement.split()))
+
+
+@contextmanager
+def timed(segment: str) -> Iterator[None]:
+    """
+    Soma a duração do bloco ao segmento da requisição atual, fora de uma
+    requisição não mede nada
+    """
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[segment] += (time.perf_counter() - start) * 1000
+
+
+def get_parameters_shape(parameters: Any, executemany: bool) -> Any:
+    """
+    Tipos dos parâmetros de um comando, sem os valores, que podem conter
+    dados pessoais
+    """
+    if executemany:
+        return f"{len(parameters)} x {get_parameters_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+
+    if timings := request_timings.get():
+        timings.statements += 1
+        timings.durations["db"] += duration
+
+    if (statements := request_statements.get()) is not None:
+        statements.append(statement)
+
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is not None and duration >= threshold:
+        logger.warning(
+            "consulta lenta (%.2f ms): %s %s",
+            duration,
+            statement,
+            get_parameters_shape(parameters, executemany),
+        )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
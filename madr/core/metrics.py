@@ -0,0 +1,302 @@
+import json
+import math
+from abc import ABC, abstractmethod
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, TypeVar
+
+from madr.core.settings import settings
+
+MetricType = Literal["counter", "gauge", "histogram"]
+Labels = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass
+class Family:
+    """
+    Amostras de uma métrica, indexadas pelo nome da amostra e pelos rótulos
+    """
+
+    name: str
+    type: MetricType
+    help: str
+    samples: dict[tuple[str, Labels], float] = field(default_factory=dict)
+
+
+class Metric(ABC):
+    type: MetricType
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Sequence[str]) -> Labels:
+        return tuple(zip(self.labelnames, map(str, values)))
+
+    @abstractmethod
+    def collect(self) -> Family: ...
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: defaultdict[Labels, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[self._labels(labels)] += amount
+
+    def collect(self) -> Family:
+        return Family(
+            self.name,
+            self.type,
+            self.help,
+            {(self.name, labels): value for labels, value in self._values.items()},
+        )
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[self._labels(labels)] -= amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._labels(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # contagem por faixa, acumulada só na exposição
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: defaultdict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._labels(labels)
+        counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def collect(self) -> Family:
+        family = Family(self.name, self.type, self.help)
+
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                family.samples[(f"{self.name}_bucket", (*labels, ("le", le)))] = (
+                    cumulative
+                )
+            family.samples[(f"{self.name}_count", labels)] = cumulative
+            family.samples[(f"{self.name}_sum", labels)] = self._sums[labels]
+
+        return family
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """
+    Métricas do processo, mais as coletadas só no momento da leitura, como o
+    estado do pool de conexões e dos caches
+    """
+
+    def __init__(self) -> None:
+        self._metrics: list[Metric] = []
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+        self._persisted_at = 0.0
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> list[Family]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def _snapshot_path(self) -> Path:
+        return Path(settings.METRICS_DIR or ".") / f"{os.getpid()}.json"
+
+    def persist(self, force: bool = False) -> None:
+        """
+        Grava as métricas do processo no diretório compartilhado entre os
+        workers, no máximo uma vez por intervalo
+        """
+        if not settings.METRICS_DIR:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._persisted_at < settings.METRICS_PERSIST_INTERVAL:
+            return
+        self._persisted_at = now
+
+        path = self._snapshot_path()
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps([_dump_family(f) for f in self.collect()]))
+        os.replace(temporary, path)
+
+    def remove_snapshot(self) -> None:
+        if settings.METRICS_DIR:
+            self._snapshot_path().unlink(missing_ok=True)
+
+    def aggregate(self) -> list[Family]:
+        """
+        Métricas de todos os workers quando há um diretório compartilhado,
+        somando contadores e histogramas e separando gauges pelo pid
+        """
+        if not settings.METRICS_DIR:
+            return self.collect()
+
+        self.persist(force=True)
+
+        families: dict[str, Family] = {}
+        for path in Path(settings.METRICS_DIR).glob("*.json"):
+            if not path.stem.isdigit():
+                continue
+            # workers encerrados à força não removem o próprio arquivo
+            if not _is_alive(int(path.stem)):
+                path.unlink(missing_ok=True)
+                continue
+
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # o worker pode ter encerrado durante a leitura
+                continue
+
+            for dumped in snapshot:
+                family = _load_family(dumped)
+                merged = families.setdefault(
+                    family.name, Family(family.name, family.type, family.help)
+                )
+                for (name, labels), value in family.samples.items():
+                    if family.type == "gauge":
+                        labels = (*labels, ("pid", path.stem))
+                    key = (name, labels)
+                    merged.samples[key] = merged.samples.get(key, 0) + value
+
+        return list(families.values())
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # o processo existe, mas pertence a outro usuário
+        return True
+    return True
+
+
+def _dump_family(family: Family) -> dict:
+    return {
+        "name": family.name,
+        "type": family.type,
+        "help": family.help,
+        "samples": [
+            [name, list(map(list, labels)), value]
+            for (name, labels), value in family.samples.items()
+        ],
+    }
+
+
+def _load_family(dumped: dict) -> Family:
+    return Family(
+        dumped["name"],
+        dumped["type"],
+        dumped["help"],
+        {
+            (name, tuple(map(tuple, labels))): value
+            for name, labels, value in dumped["samples"]
+        },
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _render_lines(families: Iterable[Family]) -> Iterator[str]:
+    for family in families:
+        yield f"# HELP {family.name} {_escape(family.help)}"
+        yield f"# TYPE {family.name} {family.type}"
+        for (name, labels), value in family.samples.items():
+            rendered_labels = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            suffix = f"{{{rendered_labels}}}" if labels else ""
+            yield f"{name}{suffix} {_format_value(value)}"
+
+
+def render(families: Iterable[Family]) -> str:
+    """
+    Formato de texto de exposição do Prometheus
+    """
+    return "\n".join(_render_lines(families)) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter(
+        "madr_http_requests_total",
+        "Requisições respondidas",
+        ["method", "route", "status"],
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "madr_http_request_duration_seconds",
+        "Duração das requisições",
+        ["method", "route"],
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("madr_http_requests_in_flight", "Requisições em andamento", ["method"])
+)
+db_pool_wait = registry.register(
+    Histogram(
+        "madr_db_pool_wait_seconds",
+        "Espera por uma conexão livre do pool",
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+    )
+)
+password_hashing_duration = registry.register(
+    Histogram(
+        "madr_password_hashing_seconds",
+        "Duração das operações do Argon2, incluindo a espera na fila",
+        ["operation"],
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    )
+)
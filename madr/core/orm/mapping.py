@@ -5,11 +5,15 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
     MetaData,
     String,
     Table,
     UniqueConstraint,
+    func,
+    literal_column,
     text,
 )
 from madr.models import User, Author, Book
@@ -30,6 +34,26 @@ meta = MetaData(naming_convention=naming_convention)
 
 mapping_registry = registry(metadata=meta)
 
+
+def search_indexes(table_name: str) -> tuple[Index, Index]:
+    """
+    Índices GIN usados pela busca textual por nome, existem só no Postgres
+    """
+    return (
+        Index(
+            f"ix_{table_name}_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            f"ix_{table_name}_name_tsv",
+            func.to_tsvector(literal_column("'simple'"), text("name")),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
 user_table = Table(
     "user",
     meta,
@@ -37,6 +61,7 @@ user_table = Table(
     Column("name", String, nullable=False),
     Column("email", String, nullable=False, unique=True),
     Column("password", String, nullable=False),
+    Column("token_version", Integer, nullable=False, server_default=text("0")),
     Column(
         "created_at", DateTime, nullable=False, server_default=text("current_timestamp")
     ),
@@ -53,7 +78,17 @@ author_table = Table(
     Column(
         "created_at", DateTime, nullable=False, server_default=text("current_timestamp")
     ),
+    Column(
+        "updated_at",
+        DateTime,
+        nullable=False,
+        server_default=text("current_timestamp"),
+        onupdate=func.current_timestamp(),
+    ),
     UniqueConstraint("name", name="uq_author_name"),
+    # ordenação por nacionalidade, com o desempate pelo id
+    Index("ix_author_nationality_id", "nationality", "id"),
+    *search_indexes("author"),
 )
 
 book_table = Table(
@@ -66,19 +101,53 @@ book_table = Table(
     Column(
         "created_at", DateTime, nullable=False, server_default=text("current_timestamp")
     ),
+    Column(
+        "updated_at",
+        DateTime,
+        nullable=False,
+        server_default=text("current_timestamp"),
+        onupdate=func.current_timestamp(),
+    ),
     UniqueConstraint("name", name="uq_book_name"),
+    UniqueConstraint("isbn", name="uq_book_isbn"),
+    # filtros por faixa de ano e ordenação por ano, com o desempate pelo id
+    Index("ix_book_year_id", "year", "id"),
+    *search_indexes("book"),
 )
 
 book_authorship_table = Table(
     "book_authorship",
     meta,
     Column("author_id", Integer, ForeignKey("author.id"), primary_key=True),
-    Column("book_id", Integer, ForeignKey("book.id"), primary_key=True),
+    # a chave primária começa por author_id, então não atende buscas por livro
+    Column("book_id", Integer, ForeignKey("book.id"), primary_key=True, index=True),
     Column(
         "created_at", DateTime, nullable=False, server_default=text("current_timestamp")
     ),
 )
 
+catalog_version_table = Table(
+    "catalog_version",
+    meta,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+# progresso das importações, compartilhado entre os workers
+import_job_table = Table(
+    "import_job",
+    meta,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("entity", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("total", Integer, nullable=True),
+    Column("processed", Integer, nullable=False),
+    Column("inserted", Integer, nullable=False),
+    Column("conflicts", JSON, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
 
 def init_mappings():
     mapping_registry.map_imperatively(User, user_table)
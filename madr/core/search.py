@@ -0,0 +1,37 @@
+from sqlalchemy import ColumnElement, and_, func, literal, literal_column, or_, true
+
+from madr.utils.sanitization import sanitize_name
+
+# configuração sem stemming, já que os nomes são próprios e em vários idiomas,
+# precisa ser idêntica à expressão dos índices GIN para que eles sejam usados
+TEXT_SEARCH_CONFIG = literal_column("'simple'")
+
+
+def name_search(
+    column: ColumnElement[str], term: str, dialect_name: str
+) -> tuple[ColumnElement[bool], ColumnElement[float]]:
+    """
+    Retorna o filtro e a relevância de uma busca textual por nome.
+
+    No Postgres combina a busca por palavras (tsvector) com a similaridade de
+    trigramas (pg_trgm), ambas servidas pelos índices GIN, nos outros bancos
+    busca todas as palavras do termo por substring
+    """
+    term = sanitize_name(term)
+
+    if not term:
+        return true(), literal(0.0)
+
+    if dialect_name == "postgresql":
+        document = func.to_tsvector(TEXT_SEARCH_CONFIG, column)
+        query = func.plainto_tsquery(TEXT_SEARCH_CONFIG, term)
+        matches = or_(document.op("@@")(query), literal(term).op("<%")(column))
+        rank = func.greatest(
+            func.ts_rank(document, query), func.word_similarity(term, column)
+        )
+        return matches, rank
+
+    matches = and_(*(column.contains(word, autoescape=True) for word in term.split()))
+    # quanto maior a fração do nome coberta pelo termo, mais relevante
+    rank = func.length(term) * 1.0 / func.length(column)
+    return matches, rank
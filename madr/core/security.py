@@ -1,19 +1,32 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from http import HTTPStatus
+import time
 from typing import Annotated
+from uuid import UUID
 from zoneinfo import ZoneInfo
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jwt import DecodeError, encode, decode, ExpiredSignatureError
+from jwt import InvalidTokenError, encode, decode
 from sqlalchemy import select
 
 from madr.deps import SessionDep
 from madr.models import User
+from madr.utils.caching import TTLCache
+from .instrumentation import timed
 from .settings import settings
 from pwdlib import PasswordHash
 from pwdlib.hashers.argon2 import Argon2Hasher
 
-pwd_context = PasswordHash((Argon2Hasher(),))
+pwd_context = PasswordHash(
+    (
+        Argon2Hasher(
+            time_cost=settings.ARGON2_TIME_COST,
+            memory_cost=settings.ARGON2_MEMORY_COST,
+            parallelism=settings.ARGON2_PARALLELISM,
+        ),
+    )
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", refreshUrl="refresh-token")
 
@@ -46,37 +59,110 @@ def verify_password_hash(plain_password: str, hashed_password: str):
     )
 
 
-async def get_current_user(
-    session: SessionDep,
-    token: Annotated[str, Depends(oauth2_scheme)],
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+@dataclass(frozen=True)
+class TokenSubject:
+    id: UUID
+    email: str
+    version: int
+
+
+# tokens repetidos não precisam ter a assinatura verificada de novo, o
+# vencimento é conferido a cada uso já que a entrada pode durar mais que ele
+decoded_tokens: TTLCache[str, tuple[TokenSubject, float]] = TTLCache(
+    max_entries=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.JWT_EXPIRATION_TIME * 60,
+)
+
+# (versão do token, usuário existe), invalidado pelas rotas que alteram ou
+# removem a conta, em outros processos vale até expirar
+user_versions: TTLCache[UUID, tuple[int, bool]] = TTLCache(
+    max_entries=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL
+)
+
+
+def decode_access_token(token: str) -> TokenSubject | None:
+    if cached := decoded_tokens.get(token):
+        subject, expires_at = cached
+        return subject if time.time() < expires_at else None
+
     try:
         payload = decode(
             token,
             settings.SECRET_KEY.get_secret_value(),
             algorithms=[settings.JWT_ALGORITHM],
+            options={"require": ["exp", "sub", "uid", "ver"]},
+        )
+        subject = TokenSubject(
+            id=UUID(payload["uid"]), email=payload["sub"], version=int(payload["ver"])
+        )
+    except (InvalidTokenError, ValueError, TypeError):
+        return None
+
+    decoded_tokens.set(token, (subject, payload["exp"]))
+    return subject
+
+
+async def get_token_subject(
+    session: SessionDep,
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> TokenSubject:
+    """
+    Autentica a requisição sem carregar o usuário, a versão do token é
+    conferida em um cache em memória e só vai ao banco quando ele expira
+    """
+    with timed("auth"):
+        subject = decode_access_token(token)
+
+        if not subject:
+            raise _credentials_exception()
+
+        user_version = (
+            user_versions.get(subject.id) if settings.AUTH_FAST_PATH else None
         )
-        subject_email = payload.get("sub")
 
-        if not subject_email:
-            raise credentials_exception
+        if user_version is None:
+            version = (
+                await session.execute(
+                    select(User.token_version).filter(User.id == subject.id)
+                )
+            ).scalar_one_or_none()
+            user_version = (version or 0, version is not None)
+            user_versions.set(subject.id, user_version)
+
+        version, exists = user_version
+        if not exists or version != subject.version:
+            raise _credentials_exception()
+
+        return subject
+
+
+async def get_current_user(
+    # uma réplica atrasada ainda aceitaria tokens revogados
+    session: SessionDep,
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> User:
+    with timed("auth"):
+        subject = decode_access_token(token)
+
+        if not subject:
+            raise _credentials_exception()
 
-    except (DecodeError, ExpiredSignatureError):
-        raise credentials_exception
+        user = await session.get(User, subject.id)
 
-    query = select(User).filter(User.email == subject_email)
-    user = (await session.execute(query)).scalar_one_or_none()
+        if not user or user.token_version != subject.version:
+            raise _credentials_exception()
 
-    if not user:
-        raise credentials_exception
+        return user
 
-    return user
 
+AuthenticatedDep = Annotated[TokenSubject, Depends(get_token_subject)]
 
 CurrentUserDep = Annotated[User, Depends(get_current_user)]
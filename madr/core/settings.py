@@ -1,4 +1,6 @@
-from pydantic import SecretStr, computed_field
+from typing import Literal
+
+from pydantic import PositiveFloat, SecretStr, computed_field
 from pydantic.networks import PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -11,7 +13,28 @@ class Settings(BaseSettings):
     SECRET_KEY: SecretStr
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_TIME: int
+    # valida tokens contra um cache em memória em vez de consultar o banco
+    AUTH_FAST_PATH: bool = True
+    AUTH_USER_CACHE_TTL: float = 30
+    AUTH_USER_CACHE_SIZE: int = 10_000
+    AUTH_TOKEN_CACHE_SIZE: int = 10_000
     PASSWORD_PEPPER: SecretStr
+    # calibrados para o hardware com `python -m madr.core.calibration`, hashes
+    # gerados com outros parâmetros são refeitos no próximo login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    # None usa o padrão do executor, proporcional ao número de CPUs
+    PASSWORD_HASHING_WORKERS: int | None = None
+    # None usa o número de CPUs
+    PASSWORD_HASHING_CONCURRENCY: int | None = None
+    PASSWORD_HASHING_QUEUE_DEPTH: int = 32
+    PASSWORD_HASHING_RETRY_AFTER: int = 1
+
+    LOGIN_RATE_LIMIT_BURST: int = 10
+    LOGIN_RATE_LIMIT_PER_MINUTE: PositiveFloat = 10
+    LOGIN_RATE_LIMIT_MAX_CLIENTS: int = 10_000
 
     @computed_field
     @property
@@ -32,9 +55,54 @@ class Settings(BaseSettings):
     DATABASE_NAME: SecretStr
     DATABASE_HOST: str = "localhost"
     DATABASE_PORT: int = 5432
+    # réplicas de leitura, como lista JSON de DSNs, usadas pelas rotas de
+    # leitura quando configuradas
+    DATABASE_REPLICA_URIS: list[SecretStr] = []
+    # por quanto tempo depois de uma escrita o cliente lê do primário, para
+    # enxergar a própria escrita apesar do atraso de replicação
+    READ_YOUR_WRITES_SECONDS: int = 5
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    # segundos até uma conexão ser reaberta, -1 mantém indefinidamente
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    # segundos de espera por uma conexão livre antes de falhar
+    DATABASE_POOL_TIMEOUT: float = 30
+    # conexões abertas na inicialização, para que as primeiras requisições
+    # depois de um deploy não paguem o custo de conexão
+    DATABASE_POOL_WARMUP: int = 2
+    READINESS_TIMEOUT: float = 2
+
+    # cabeçalho Server-Timing com o tempo de banco, autenticação, hash e
+    # serialização de cada requisição
+    SERVER_TIMING: bool = True
+    # comandos mais lentos são registrados no log, None desativa
+    SLOW_QUERY_THRESHOLD_MS: float | None = None
+    # modo de desenvolvimento, registra no log comandos de mesma forma
+    # repetidos ao menos essa quantidade de vezes em uma requisição (N+1)
+    N_PLUS_ONE_THRESHOLD: int | None = None
+
+    # diretório compartilhado pelos workers para agregar as métricas de todos
+    # em /metrics, None expõe só as do processo que atender a leitura
+    METRICS_DIR: str | None = None
+    METRICS_PERSIST_INTERVAL: float = 5
 
     SUPPORTED_LOCALES: list[str] = ["en", "pt"]
     DEFAULT_LOCALE: str = "pt"
 
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL: float = 60
+
+    # páginas maiores devem usar as rotas de exportação
+    MAX_PAGE_SIZE: int = 100
+    MAX_BATCH_IDS: int = 1000
+    EXPORT_BATCH_SIZE: int = 500
+
+    IMPORT_BATCH_SIZE: int = 1000
+    # arquivos maiores são importados em segundo plano
+    IMPORT_SYNC_MAX_ROWS: int = 1000
+    # jobs encerrados há mais tempo são removidos
+    IMPORT_JOB_TTL: float = 3600
+
 
 settings = Settings()  # pyright: ignore[reportCallIssue]
@@ -1,12 +1,17 @@
-from collections.abc import Mapping
+from collections.abc import AsyncGenerator, Mapping
+import math
 from typing import Annotated, Any
 
 from fastapi import Depends, Request
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from madr.core.database import get_async_session
+from madr.core import database
+from madr.core.database import get_async_session, get_session_maker
 from madr.core.i18n import get_translation
+from madr.core.settings import settings
+from madr.exceptions import TooManyRequestsException
 from madr.utils.headers import get_languages_from_header
+from madr.utils.rate_limit import TokenBucketLimiter
 
 
 def get_i18n(request: Request) -> Mapping[str, str]:
@@ -20,3 +25,52 @@ def get_i18n(request: Request) -> Mapping[str, str]:
 I18nDep = Annotated[Mapping[str, Any], Depends(get_i18n)]
 
 SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+SessionMakerDep = Annotated[
+    async_sessionmaker[AsyncSession], Depends(get_session_maker)
+]
+
+# marca, enviada como cookie ou cabeçalho, de que o cliente escreveu há pouco
+READ_PRIMARY_COOKIE = "read_primary"
+READ_PRIMARY_HEADER = "x-read-primary"
+
+
+def get_read_session_maker(
+    request: Request, primary: SessionMakerDep
+) -> async_sessionmaker[AsyncSession]:
+    """
+    Leituras vão para uma réplica, exceto logo depois de uma escrita do
+    próprio cliente, que ainda pode não ter chegado às réplicas
+    """
+    if not database.replica_selector or (
+        READ_PRIMARY_COOKIE in request.cookies or READ_PRIMARY_HEADER in request.headers
+    ):
+        return primary
+
+    return database.replica_selector.choose()
+
+
+async def get_read_session(
+    session_maker: Annotated[
+        async_sessionmaker[AsyncSession], Depends(get_read_session_maker)
+    ],
+) -> AsyncGenerator[AsyncSession, Any]:
+    async with session_maker() as session:
+        yield session
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+login_limiter = TokenBucketLimiter(
+    capacity=settings.LOGIN_RATE_LIMIT_BURST,
+    refill_rate=settings.LOGIN_RATE_LIMIT_PER_MINUTE / 60,
+    max_clients=settings.LOGIN_RATE_LIMIT_MAX_CLIENTS,
+)
+
+
+def limit_login_attempts(request: Request, i18n: I18nDep) -> None:
+    client = request.client.host if request.client else "unknown"
+
+    if retry_after := login_limiter.acquire(client):
+        raise TooManyRequestsException(i18n=i18n, retry_after=math.ceil(retry_after))
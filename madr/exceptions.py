@@ -61,3 +61,49 @@ class ConflictException(HTTPException):
             detail=i18n["exceptions"]["conflict"].format(i18n["entities"][entity]),
             headers=headers,
         )
+
+
+class ServiceUnavailableException(HTTPException):
+    def __init__(
+        self,
+        i18n: Annotated[
+            Mapping[str, Any],
+            Doc("""
+                    Translation keys
+                    """),
+        ],
+        retry_after: Annotated[
+            int,
+            Doc("""
+                    Seconds the client should wait before retrying.
+                    """),
+        ],
+    ) -> None:
+        super().__init__(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail=i18n["exceptions"]["unavailable"],
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class TooManyRequestsException(HTTPException):
+    def __init__(
+        self,
+        i18n: Annotated[
+            Mapping[str, Any],
+            Doc("""
+                    Translation keys
+                    """),
+        ],
+        retry_after: Annotated[
+            int,
+            Doc("""
+                    Seconds the client should wait before retrying.
+                    """),
+        ],
+    ) -> None:
+        super().__init__(
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            detail=i18n["exceptions"]["too_many_requests"].format(retry_after),
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,218 @@
+from collections import Counter
+from http import HTTPStatus
+import logging
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from madr.core.catalog import catalog_writes
+from madr.core.instrumentation import (
+    RequestTimings,
+    get_statement_shape,
+    request_statements,
+    request_timings,
+)
+from madr.core.metrics import (
+    http_request_duration,
+    http_requests,
+    http_requests_in_flight,
+    registry,
+)
+from madr.core import database
+from madr.core.settings import settings
+from madr.deps import READ_PRIMARY_COOKIE
+from madr.utils.caching import is_not_modified, parse_http_date
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalRequestMiddleware:
+    """
+    Responde 304 para qualquer GET cuja resposta traga ETag ou Last-Modified
+    compatíveis com as pré-condições da requisição, rotas que conhecem a
+    versão do recurso antes de consultá-lo devem usar
+    `get_not_modified_response` para evitar o trabalho por completo
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        not_modified = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal not_modified
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # mensagens de erro são traduzidas a partir deste cabeçalho
+                headers.add_vary_header("Accept-Language")
+
+                last_modified = headers.get("last-modified")
+                if message["status"] == HTTPStatus.OK and is_not_modified(
+                    request_headers,
+                    headers.get("etag"),
+                    parse_http_date(last_modified) if last_modified else None,
+                ):
+                    not_modified = True
+                    del headers["content-length"]
+                    del headers["content-type"]
+                    message["status"] = HTTPStatus.NOT_MODIFIED
+
+            elif message["type"] == "http.response.body" and not_modified:
+                if message.get("more_body", False):
+                    return
+                message = {"type": "http.response.body", "body": b""}
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class ServerTimingMiddleware:
+    """
+    Mede as etapas de cada requisição e as envia no cabeçalho Server-Timing,
+    respostas em streaming só incluem o que foi medido antes do primeiro envio
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Conta as requisições por rota e status e mede a duração delas até o fim
+    do corpo, rotuladas pelo caminho declarado da rota para manter a
+    cardinalidade limitada
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method)
+            # o roteador registra a rota encontrada no próprio scope
+            route = scope.get("route")
+            path = getattr(route, "path", "<desconhecida>")
+
+            http_requests.inc(method, path, str(int(status)))
+            http_request_duration.observe(time.perf_counter() - start, method, path)
+            registry.persist()
+
+
+class QueryPatternMiddleware:
+    """
+    Modo de desenvolvimento, avisa quando uma requisição repete o mesmo
+    comando várias vezes, o sinal típico de consultas N+1
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        threshold = settings.N_PLUS_ONE_THRESHOLD
+        if scope["type"] != "http" or threshold is None:
+            await self.app(scope, receive, send)
+            return
+
+        statements: list[str] = []
+        token = request_statements.set(statements)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_statements.reset(token)
+
+        shapes = Counter(map(get_statement_shape, statements))
+        for shape, count in shapes.items():
+            if count >= threshold:
+                logger.warning(
+                    "possível N+1, comando repetido %d vezes em %s %s: %s",
+                    count,
+                    scope["method"],
+                    scope["path"],
+                    shape,
+                )
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marca com um cookie de curta duração os clientes que acabaram de
+    alterar um catálogo, para que as leituras seguintes deles usem o primário
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in ("GET", "HEAD", "OPTIONS")
+            or not database.replica_selector
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        writes: set[str] = set()
+        catalog_writes.set(writes)
+
+        async def send_wrapper(message: Message) -> None:
+            # POSTs que só leem, como /token e /livro/ids, não marcam o cliente
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and writes
+            ):
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{READ_PRIMARY_COOKIE}=1; "
+                    f"Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
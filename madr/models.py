@@ -9,6 +9,7 @@ class User:
     name: str
     email: str
     password: str
+    token_version: int = field(init=False)
     created_at: datetime = field(init=False)
 
 
@@ -20,6 +21,7 @@ class Author:
     nationality: str
     birth_date: date
     created_at: datetime = field(init=False)
+    updated_at: datetime = field(init=False)
 
 
 @dataclass
@@ -31,3 +33,8 @@ class Book:
     isbn: str | None = None
     authors: list[Author] = field(default_factory=list)
     created_at: datetime = field(init=False)
+    updated_at: datetime = field(init=False)
+
+    @property
+    def authors_names(self) -> list[str]:
+        return [author.name for author in self.authors]
@@ -0,0 +1,164 @@
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from sqlalchemy import ColumnElement, Select, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.orm.mapping import author_table, book_authorship_table
+from madr.core.search import name_search
+from madr.utils.batch import order_by_ids
+
+
+@dataclass(frozen=True, slots=True)
+class AuthorRow:
+    """
+    Romancista somente para leitura, sem a instrumentação e o identity map do
+    ORM
+    """
+
+    id: int
+    name: str
+    nationality: str
+    birth_date: date
+
+
+# chaves aceitas na ordenação da listagem, todas apoiadas por um índice
+AUTHOR_SORT_KEYS: dict[str, ColumnElement] = {
+    "id": author_table.c.id,
+    "nome": author_table.c.name,
+    "nacionalidade": author_table.c.nationality,
+}
+
+
+def select_authors() -> Select:
+    return select(
+        author_table.c.id,
+        author_table.c.name,
+        author_table.c.nationality,
+        author_table.c.birth_date,
+    )
+
+
+def filter_authors(
+    query: Select,
+    dialect_name: str,
+    name: str | None = None,
+    search: str | None = None,
+) -> Select:
+    """
+    Filtros da listagem de romancistas, com a busca textual ordenando por
+    relevância
+    """
+    if name:
+        query = query.filter(
+            author_table.c.name.contains(name),
+        )
+
+    if search:
+        matches, rank = name_search(author_table.c.name, search, dialect_name)
+        query = query.filter(matches).order_by(rank.desc())
+
+    return query
+
+
+async def fetch_authors(session: AsyncSession, query: Select) -> list[AuthorRow]:
+    return [AuthorRow(*row) for row in await session.execute(query)]
+
+
+async def stream_authors(
+    session: AsyncSession,
+    query: Select,
+    batch_size: int,
+) -> AsyncIterator[list[AuthorRow]]:
+    """
+    Percorre uma consulta derivada de `select_authors` por um cursor do lado
+    do servidor, em lotes de tamanho fixo, mantendo a memória constante
+    """
+    result = await session.stream(query.execution_options(yield_per=batch_size))
+
+    async for rows in result.partitions():
+        yield [AuthorRow(*row) for row in rows]
+
+
+async def fetch_authors_by_ids(
+    session: AsyncSession, ids: Sequence[int]
+) -> tuple[list[AuthorRow], list[int]]:
+    """
+    Busca vários romancistas em uma única consulta IN, na ordem pedida, junto
+    dos ids que não existem
+    """
+    rows = await fetch_authors(
+        session, select_authors().filter(author_table.c.id.in_(ids))
+    )
+    return order_by_ids(rows, ids)
+
+
+async def fetch_author(session: AsyncSession, id: int) -> AuthorRow | None:
+    rows = await fetch_authors(
+        session, select_authors().filter(author_table.c.id == id)
+    )
+    return rows[0] if rows else None
+
+
+def select_author_ids(
+    dialect_name: str,
+    ids: Sequence[int] | None = None,
+    name: str | None = None,
+    search: str | None = None,
+) -> Select:
+    """
+    Ids dos romancistas selecionados por uma operação em lote, pelos ids
+    informados e pelos mesmos filtros da listagem
+    """
+    query = filter_authors(
+        select(author_table.c.id), dialect_name, name, search
+    ).order_by(None)
+
+    if ids is not None:
+        query = query.filter(author_table.c.id.in_(ids))
+
+    return query
+
+
+async def update_authors(
+    session: AsyncSession, selection: Select, values: dict[str, Any]
+) -> list[int]:
+    query = (
+        update(author_table)
+        .values(values)
+        .filter(author_table.c.id.in_(selection))
+        .returning(author_table.c.id)
+    )
+    return list((await session.execute(query)).scalars())
+
+
+async def delete_authors(
+    session: AsyncSession, selection: Select
+) -> tuple[list[int], list[int]]:
+    """
+    Remove os romancistas selecionados que não possuem livros, retornando os
+    ids removidos e os mantidos por ainda estarem vinculados a algum livro
+    """
+    with_books = list(
+        (
+            await session.execute(
+                select(book_authorship_table.c.author_id)
+                .filter(book_authorship_table.c.author_id.in_(selection))
+                .distinct()
+                .order_by(book_authorship_table.c.author_id)
+            )
+        ).scalars()
+    )
+    query = (
+        delete(author_table)
+        .filter(
+            author_table.c.id.in_(selection),
+            author_table.c.id.not_in(
+                select(book_authorship_table.c.author_id).scalar_subquery()
+            ),
+        )
+        .returning(author_table.c.id)
+    )
+    return list((await session.execute(query)).scalars()), with_books
@@ -0,0 +1,417 @@
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    Text,
+    cast,
+    func,
+    delete,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.database import dialect_insert, get_dialect_name
+from madr.core.instrumentation import timed
+from madr.core.orm.mapping import author_table, book_authorship_table, book_table
+from madr.core.search import name_search
+from madr.utils.batch import order_by_ids
+
+
+def book_json_object() -> ColumnElement[str]:
+    """
+    Objeto JSON de um livro no mesmo formato de `BookSchema`, montado pelo
+    Postgres com os nomes dos romancistas agregados em uma subconsulta
+    correlacionada, o que devolve uma linha por livro sem o produto cartesiano
+    do joined load
+    """
+    authors_names = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(author_table.c.name, author_table.c.id)
+                ),
+                literal_column("'[]'::json"),
+            )
+        )
+        .select_from(
+            book_authorship_table.join(
+                author_table, author_table.c.id == book_authorship_table.c.author_id
+            )
+        )
+        .where(book_authorship_table.c.book_id == book_table.c.id)
+        .scalar_subquery()
+    )
+
+    # as chaves seguem os aliases de BookSchema, o cast para texto evita que
+    # o driver decodifique o JSON que só seria codificado de novo
+    return cast(
+        func.json_build_object(
+            "isbn",
+            book_table.c.isbn,
+            "nome",
+            book_table.c.name,
+            "ano",
+            book_table.c.year,
+            "id",
+            book_table.c.id,
+            "authors_names",
+            authors_names,
+        ),
+        Text,
+    ).label("json")
+
+
+def json_array(objects: Iterable[str]) -> bytes:
+    with timed("serialize"):
+        return b"[" + b",".join(item.encode() for item in objects) + b"]"
+
+
+@dataclass(frozen=True, slots=True)
+class BookRow:
+    """
+    Livro somente para leitura, sem a instrumentação e o identity map do ORM
+    """
+
+    id: int
+    isbn: str | None
+    name: str
+    year: int
+    authors_names: list[str]
+
+
+BOOK_COLUMNS = (
+    book_table.c.id,
+    book_table.c.isbn,
+    book_table.c.name,
+    book_table.c.year,
+)
+
+
+# chaves aceitas na ordenação da listagem, todas apoiadas por um índice
+BOOK_SORT_KEYS: dict[str, ColumnElement] = {
+    "id": book_table.c.id,
+    "nome": book_table.c.name,
+    "ano": book_table.c.year,
+}
+
+
+def select_books() -> Select:
+    return select(*BOOK_COLUMNS)
+
+
+async def get_authors_names(
+    session: AsyncSession, book_ids: Sequence[int]
+) -> dict[int, list[str]]:
+    """
+    Nomes dos romancistas de vários livros em uma única consulta
+    """
+    if not book_ids:
+        return {}
+
+    query = (
+        select(book_authorship_table.c.book_id, author_table.c.name)
+        .join(author_table, author_table.c.id == book_authorship_table.c.author_id)
+        .filter(book_authorship_table.c.book_id.in_(book_ids))
+        .order_by(author_table.c.id)
+    )
+
+    names = defaultdict(list)
+    for book_id, name in await session.execute(query):
+        names[book_id].append(name)
+    return names
+
+
+def filter_books(
+    query: Select,
+    dialect_name: str,
+    name: str | None = None,
+    search: str | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+) -> Select:
+    """
+    Filtros da listagem de livros, com a busca textual ordenando por relevância
+    """
+    if name:
+        query = query.filter(
+            book_table.c.name.contains(name, autoescape=True),
+        )
+
+    if start_year:
+        query = query.filter(book_table.c.year >= start_year)
+
+    if end_year:
+        query = query.filter(book_table.c.year <= end_year)
+
+    if search:
+        matches, rank = name_search(book_table.c.name, search, dialect_name)
+        query = query.filter(matches).order_by(rank.desc())
+
+    return query
+
+
+async def _with_authors_names(
+    session: AsyncSession, rows: Sequence[Row]
+) -> list[BookRow]:
+    names = await get_authors_names(session, [row.id for row in rows])
+
+    return [
+        BookRow(row.id, row.isbn, row.name, row.year, names.get(row.id, []))
+        for row in rows
+    ]
+
+
+async def fetch_books(session: AsyncSession, query: Select) -> list[BookRow]:
+    """
+    Executa uma consulta derivada de `select_books` e completa as linhas com
+    os nomes dos romancistas, sem a explosão de linhas do joined load
+    """
+    rows = (await session.execute(query)).all()
+    return await _with_authors_names(session, rows)
+
+
+async def stream_books(
+    session: AsyncSession,
+    query: Select,
+    batch_size: int,
+) -> AsyncIterator[list[BookRow]]:
+    """
+    Percorre uma consulta derivada de `select_books` por um cursor do lado do
+    servidor, em lotes de tamanho fixo, mantendo a memória constante
+    """
+    result = await session.stream(query.execution_options(yield_per=batch_size))
+
+    async for rows in result.partitions():
+        yield await _with_authors_names(session, rows)
+
+
+async def fetch_book(session: AsyncSession, id: int) -> BookRow | None:
+    rows = await fetch_books(session, select_books().filter(book_table.c.id == id))
+    return rows[0] if rows else None
+
+
+async def fetch_books_by_ids(
+    session: AsyncSession, ids: Sequence[int]
+) -> tuple[list[BookRow], list[int]]:
+    """
+    Busca vários livros em uma única consulta IN, na ordem pedida, junto dos
+    ids que não existem
+    """
+    rows = await fetch_books(session, select_books().filter(book_table.c.id.in_(ids)))
+    return order_by_ids(rows, ids)
+
+
+async def fetch_book_by_isbn(session: AsyncSession, isbn: str) -> BookRow | None:
+    rows = await fetch_books(session, select_books().filter(book_table.c.isbn == isbn))
+    return rows[0] if rows else None
+
+
+async def insert_book(session: AsyncSession, values: dict[str, Any]) -> Row:
+    query = insert(book_table).values(values).returning(*BOOK_COLUMNS)
+    return (await session.execute(query)).one()
+
+
+async def update_book_columns(
+    session: AsyncSession, id: int, values: dict[str, Any]
+) -> Row | None:
+    """
+    Atualiza as colunas informadas, sempre marcando updated_at para que uma
+    troca só de romancistas também conte como alteração do livro
+    """
+    query = (
+        update(book_table)
+        .values({**values, "updated_at": func.current_timestamp()})
+        .filter(book_table.c.id == id)
+        .returning(*BOOK_COLUMNS)
+    )
+    return (await session.execute(query)).one_or_none()
+
+
+async def upsert_book(session: AsyncSession, values: dict[str, Any]) -> Row | None:
+    """
+    Insere o livro ou atualiza o de mesmo ISBN em um único comando, sem
+    reescrever a linha quando nada mudou, caso em que não retorna nada. A
+    coluna `created` indica se a linha foi inserida
+    """
+    # só uma linha nova tem o created_at desta inserção
+    created_at = datetime.now(tz=ZoneInfo("UTC")).replace(tzinfo=None)
+    query = dialect_insert(session, book_table).values(
+        {**values, "created_at": created_at}
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[book_table.c.isbn],
+        set_={
+            "name": query.excluded.name,
+            "year": query.excluded.year,
+            "updated_at": func.current_timestamp(),
+        },
+        where=or_(
+            book_table.c.name.is_distinct_from(query.excluded.name),
+            book_table.c.year.is_distinct_from(query.excluded.year),
+        ),
+    ).returning(*BOOK_COLUMNS, (book_table.c.created_at == created_at).label("created"))
+    return (await session.execute(query)).one_or_none()
+
+
+async def link_authors(
+    session: AsyncSession, book_id: int, author_ids: Iterable[int]
+) -> list[Row]:
+    """
+    Vincula ao livro, em um único INSERT ... SELECT, os romancistas existentes
+    entre os ids informados e ainda não vinculados, retornando id e nome deles
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return []
+
+    # no RETURNING as colunas são renderizadas sem o nome da tabela, então a
+    # subconsulta usa um alias e referencia a linha inserida explicitamente
+    linked_author = author_table.alias("linked_author")
+    name = (
+        select(linked_author.c.name)
+        .filter(linked_author.c.id == literal_column("book_authorship.author_id"))
+        .scalar_subquery()
+    )
+    query = (
+        dialect_insert(session, book_authorship_table)
+        .from_select(
+            ["book_id", "author_id"],
+            select(literal(book_id), author_table.c.id).filter(
+                author_table.c.id.in_(author_ids)
+            ),
+        )
+        .on_conflict_do_nothing()
+        .returning(book_authorship_table.c.author_id, name.label("name"))
+    )
+    return sorted(await session.execute(query), key=lambda row: row.author_id)
+
+
+async def replace_authors(
+    session: AsyncSession, book_id: int, author_ids: Iterable[int]
+) -> tuple[list[Row], bool]:
+    """
+    Troca os romancistas do livro pelos existentes entre os ids informados,
+    removendo e inserindo só os vínculos que mudaram, e retorna id e nome dos
+    vinculados e se algum vínculo mudou. No Postgres é um único comando
+    """
+    author_ids = list(author_ids)
+    unlink = delete(book_authorship_table).filter(
+        book_authorship_table.c.book_id == book_id,
+        book_authorship_table.c.author_id.not_in(author_ids),
+    )
+    if not author_ids:
+        return [], bool((await session.execute(unlink)).rowcount)
+
+    # o created_at explícito distingue os vínculos novos dos já existentes
+    linked_at = datetime.now(tz=ZoneInfo("UTC")).replace(tzinfo=None)
+    linked_author = author_table.alias("linked_author")
+    name = (
+        select(linked_author.c.name)
+        .filter(linked_author.c.id == literal_column("book_authorship.author_id"))
+        .scalar_subquery()
+    )
+    link = dialect_insert(session, book_authorship_table).from_select(
+        ["book_id", "author_id", "created_at"],
+        select(literal(book_id), author_table.c.id, literal(linked_at)).filter(
+            author_table.c.id.in_(author_ids)
+        ),
+    )
+    # a atualização não muda nada, só faz o RETURNING incluir os vínculos
+    # existentes
+    link = link.on_conflict_do_update(
+        index_elements=[
+            book_authorship_table.c.author_id,
+            book_authorship_table.c.book_id,
+        ],
+        set_={"author_id": link.excluded.author_id},
+    )
+    returning = [
+        book_authorship_table.c.author_id.label("id"),
+        name.label("name"),
+        (book_authorship_table.c.created_at == linked_at).label("added"),
+    ]
+
+    if get_dialect_name(session) == "postgresql":
+        # a remoção vai em uma CTE do mesmo comando, sem romancistas
+        # existentes não há linhas, mas a rota rejeita esse caso
+        removed = unlink.returning(book_authorship_table.c.author_id).cte("removed")
+        removed_count = (
+            select(func.count()).select_from(removed).scalar_subquery().label("removed")
+        )
+        rows = list(
+            await session.execute(
+                link.add_cte(removed).returning(*returning, removed_count)
+            )
+        )
+        changed = any(row.added or row.removed for row in rows)
+    else:
+        removed = (await session.execute(unlink)).rowcount
+        rows = list(await session.execute(link.returning(*returning)))
+        changed = bool(removed) or any(row.added for row in rows)
+
+    return sorted(rows, key=lambda row: row.id), changed
+
+
+def select_book_ids(
+    dialect_name: str,
+    ids: Sequence[int] | None = None,
+    name: str | None = None,
+    search: str | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+) -> Select:
+    """
+    Ids dos livros selecionados por uma operação em lote, pelos ids
+    informados e pelos mesmos filtros da listagem
+    """
+    query = filter_books(
+        select(book_table.c.id), dialect_name, name, search, start_year, end_year
+    ).order_by(None)
+
+    if ids is not None:
+        query = query.filter(book_table.c.id.in_(ids))
+
+    return query
+
+
+async def update_books(
+    session: AsyncSession, selection: Select, values: dict[str, Any]
+) -> list[int]:
+    query = (
+        update(book_table)
+        .values(values)
+        .filter(book_table.c.id.in_(selection))
+        .returning(book_table.c.id)
+    )
+    return list((await session.execute(query)).scalars())
+
+
+async def delete_books(session: AsyncSession, selection: Select) -> list[int]:
+    """
+    Remove os livros selecionados junto com os vínculos com romancistas,
+    que não são apagados em cascata pelo banco
+    """
+    await session.execute(
+        delete(book_authorship_table).filter(
+            book_authorship_table.c.book_id.in_(selection)
+        )
+    )
+    query = (
+        delete(book_table)
+        .filter(book_table.c.id.in_(selection))
+        .returning(book_table.c.id)
+    )
+    return list((await session.execute(query)).scalars())
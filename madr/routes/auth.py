@@ -4,31 +4,46 @@ import string
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import delete, insert, select, update
 from sqlalchemy.exc import IntegrityError
 
+from madr.core.hashing import (
+    get_dummy_hash,
+    hash_password_async,
+    verify_password_hash_async,
+)
 from madr.core.security import (
+    AuthenticatedDep,
     CurrentUserDep,
     create_access_token,
-    hash_password,
-    verify_password_hash,
+    user_versions,
 )
-from madr.deps import I18nDep, SessionDep
+from madr.deps import I18nDep, SessionDep, limit_login_attempts
 from madr.exceptions import ConflictException
 from madr.models import User as UserTable
 from madr.schema import AccessToken, UserCreate, UserSchema
+from madr.utils.caching import make_weak_etag
 
 router = APIRouter(tags=["Conta"])
 
 
-@router.get("/conta/minha-conta")
-async def account_info(current_user: CurrentUserDep):
+@router.get("/conta/minha-conta", response_model=UserSchema)
+async def account_info(response: Response, current_user: CurrentUserDep):
+    # usuários não têm versão, então a ETag deriva dos campos expostos e o
+    # middleware de requisições condicionais responde 304 quando ela não muda
+    response.headers["ETag"] = make_weak_etag(
+        "user", current_user.id, current_user.name, current_user.email
+    )
     return UserSchema.model_validate(current_user, from_attributes=True, by_name=True)
 
 
-@router.post("/token")
+@router.post(
+    "/token",
+    response_model=AccessToken,
+    dependencies=[Depends(limit_login_attempts)],
+)
 async def login(
     form: Annotated[OAuth2PasswordRequestForm, Depends()],
     i18n: I18nDep,
@@ -39,16 +54,15 @@ async def login(
 
     # Utilizando um hash de stub para evitar ataques temporais quando o usuário não existe
     if not user:
-        _ = verify_password_hash(
-            plain_password=hash_password("a" * 10),
-            hashed_password=hash_password("b" * 10),
+        _ = await verify_password_hash_async(
+            plain_password=form.password, hashed_password=await get_dummy_hash()
         )
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail=i18n["exceptions"]["wrong_credentials"],
         )
 
-    matches, new_hash = verify_password_hash(
+    matches, new_hash = await verify_password_hash_async(
         plain_password=form.password, hashed_password=user.password
     )
 
@@ -58,25 +72,44 @@ async def login(
             detail=i18n["exceptions"]["wrong_credentials"],
         )
 
+    # o commit expira os atributos do usuário, então as claims vêm antes dele
+    claims = {"sub": user.email, "uid": str(user.id), "ver": user.token_version}
+
+    # hashes gerados com parâmetros antigos do Argon2 são refeitos
     if new_hash:
         user.password = new_hash
-        session.add(user)
+        await session.commit()
 
-    token = create_access_token({"sub": user.email})
+    token = create_access_token(claims)
 
     return AccessToken(access_token=token, token_type="Bearer")
 
 
-@router.post("/refresh-token")
-async def refresh_token(current_user: CurrentUserDep):
-    new_token = create_access_token({"sub": current_user.email})
+@router.post("/refresh-token", response_model=AccessToken)
+async def refresh_token(current_user: AuthenticatedDep):
+    new_token = create_access_token(
+        {
+            "sub": current_user.email,
+            "uid": str(current_user.id),
+            "ver": current_user.version,
+        }
+    )
     return AccessToken(access_token=new_token, token_type="Bearer")
 
 
-@router.post("/conta", status_code=HTTPStatus.CREATED)
+@router.post("/conta", status_code=HTTPStatus.CREATED, response_model=UserSchema)
 async def sign_up(user: UserCreate, i18n: I18nDep, session: SessionDep):
     try:
-        query = insert(UserTable).values(user.model_dump()).returning(UserTable)
+        query = (
+            insert(UserTable)
+            .values(
+                {
+                    **user.model_dump(),
+                    "password": await hash_password_async(user.password),
+                }
+            )
+            .returning(UserTable)
+        )
         result = (await session.execute(query)).scalar_one()
         serialized_result = UserSchema.model_validate(
             result, from_attributes=True, by_name=True
@@ -88,13 +121,13 @@ async def sign_up(user: UserCreate, i18n: I18nDep, session: SessionDep):
         raise ConflictException(entity="user", i18n=i18n)
 
 
-@router.put("/conta/{id}")
+@router.put("/conta/{id}", response_model=UserSchema)
 async def update_account(
     user: UserCreate,
     id: UUID,
     i18n: I18nDep,
     session: SessionDep,
-    current_user: CurrentUserDep,
+    current_user: AuthenticatedDep,
 ):
     try:
         if id != current_user.id:
@@ -105,7 +138,14 @@ async def update_account(
 
         query = (
             update(UserTable)
-            .values(user.model_dump())
+            .values(
+                {
+                    **user.model_dump(),
+                    "password": await hash_password_async(user.password),
+                    # tokens emitidos antes da alteração deixam de valer
+                    "token_version": UserTable.token_version + 1,
+                }
+            )
             .filter(UserTable.id == id)
             .returning(UserTable)
         )
@@ -116,6 +156,7 @@ async def update_account(
         )
 
         await session.commit()
+        user_versions.discard(id)
 
         return serialized_result
 
@@ -125,7 +166,7 @@ async def update_account(
 
 @router.delete("/conta/{id}")
 async def delete_account(
-    id: UUID, i18n: I18nDep, session: SessionDep, current_user: CurrentUserDep
+    id: UUID, i18n: I18nDep, session: SessionDep, current_user: AuthenticatedDep
 ):
     if id != current_user.id:
         raise HTTPException(
@@ -138,6 +179,7 @@ async def delete_account(
 
     if deleted_rows == 1:
         await session.commit()
+        user_versions.discard(id)
         return i18n["success"]["delete"].format(i18n["entities"]["user"])
     else:
         await session.rollback()
@@ -1,76 +1,236 @@
+from collections.abc import Mapping
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from sqlalchemy import delete, func, insert, select, update
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, delete, insert, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.core.security import CurrentUserDep
-from madr.deps import I18nDep, SessionDep
+from madr.core.catalog import (
+    AUTHOR_CATALOG,
+    BOOK_CATALOG,
+    bump_catalog_version,
+    get_catalog_version,
+)
+from madr.core.database import get_dialect_name
+from madr.core.imports import InvalidFileError, merge_authors, start_import
+from madr.core.orm.mapping import author_table
+from madr.core.security import AuthenticatedDep
+from madr.core.settings import settings
+from madr.deps import I18nDep, ReadSessionDep, SessionDep, SessionMakerDep
 from madr.exceptions import ConflictException, NotFoundException
 from madr.models import Author
-from madr.schema import AuthorCreate, AuthorSchema, AuthorUpdate
-from madr.utils.caching import get_last_modified_response
+from madr.repositories.authors import (
+    AUTHOR_SORT_KEYS,
+    delete_authors,
+    fetch_author,
+    fetch_authors,
+    fetch_authors_by_ids,
+    filter_authors,
+    select_author_ids,
+    select_authors,
+    stream_authors,
+    update_authors,
+)
+from madr.schema import (
+    AuthorBatchChanges,
+    AuthorCreate,
+    AuthorSchema,
+    AuthorUpdate,
+    BatchIds,
+    BatchResult,
+    CommaSeparatedIds,
+    ImportJobSchema,
+)
+from madr.utils.caching import (
+    CachedResponse,
+    get_caching_headers,
+    get_not_modified_response,
+    response_cache,
+)
+from madr.utils.batch import get_batch_result, get_missing_ids_headers
+from madr.utils.pagination import (
+    InvalidCursorError,
+    InvalidSortError,
+    get_next_cursor,
+    paginate,
+    parse_sort,
+)
+from madr.utils.sanitization import sanitize_name
+from madr.utils.serialization import (
+    EXPORT_MEDIA_TYPES,
+    FileFormat,
+    author_list_adapter,
+    dump_json_list,
+    export_rows,
+)
 
 router = APIRouter(prefix="/romancista", tags=["Autores"])
 
 
+async def get_many(
+    session: AsyncSession, ids: list[int], headers: dict[str, str] | None = None
+) -> Response:
+    results, missing_ids = await fetch_authors_by_ids(session, ids)
+
+    return Response(
+        content=dump_json_list(author_list_adapter, results),
+        media_type="application/json",
+        headers={**(headers or {}), **get_missing_ids_headers(missing_ids)},
+    )
+
+
 @router.get("/")
 async def get_list(
     request: Request,
-    session: SessionDep,
+    i18n: I18nDep,
+    session: ReadSessionDep,
     name: Annotated[str | None, Query(alias="nome")] = None,
-    limit: Annotated[int, Query(alias="limite")] = 20,
-    offset: Annotated[int, Query(alias="deslocamento")] = 0,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    limit: Annotated[int, Query(alias="limite", ge=1, le=settings.MAX_PAGE_SIZE)] = 20,
+    offset: Annotated[int, Query(alias="deslocamento", ge=0)] = 0,
+    cursor: str | None = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+    sort_by: Annotated[str | None, Query(alias="ordenar")] = None,
 ):
-    last_modified = (
-        await session.execute(select(func.max(Author.created_at)))
-    ).scalar_one_or_none()
+    catalog = await get_catalog_version(session, AUTHOR_CATALOG)
+    etag = catalog.etag() if catalog else None
+    last_modified = catalog.updated_at if catalog else None
+
+    if not_modified_response := get_not_modified_response(request, etag, last_modified):
+        return not_modified_response
+
+    if ids is not None:
+        return await get_many(session, ids, get_caching_headers(etag, last_modified))
+
+    try:
+        sort = parse_sort(sort_by, AUTHOR_SORT_KEYS, author_table.c.id)
+    except InvalidSortError as e:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_sort"].format(e),
+        )
+
+    # corpos de sucesso não dependem do idioma, então ele não faz parte da chave
+    cache_key = (
+        (AUTHOR_CATALOG, catalog.version, name, search, sort_by, limit, offset, cursor)
+        if catalog
+        else None
+    )
+    if cache_key and (cached := response_cache.get(cache_key)):
+        return Response(
+            content=cached.body,
+            media_type="application/json",
+            headers={**get_caching_headers(etag, last_modified), **cached.headers},
+        )
+
+    query = select_authors()
+
+    # a ordenação por relevância não é estável entre páginas, então não é
+    # possível continuar a partir de um cursor
+    if search and cursor:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_cursor"],
+        )
 
-    cache_response = get_last_modified_response(last_modified, request)
+    query = filter_authors(query, get_dialect_name(session), name, search)
 
-    if cache_response:
-        return cache_response
+    try:
+        query = paginate(query, sort, limit, offset, cursor)
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_cursor"],
+        )
+
+    results = await fetch_authors(session, query)
+
+    pagination_headers = {}
+    if not search and (next_cursor := get_next_cursor(results, sort, limit)):
+        pagination_headers["X-Next-Cursor"] = next_cursor
 
-    query = select(Author).limit(limit).offset(offset)
+    response = Response(
+        content=dump_json_list(author_list_adapter, results),
+        media_type="application/json",
+        headers={**get_caching_headers(etag, last_modified), **pagination_headers},
+    )
 
-    if name:
-        query = query.filter(
-            Author.name.contains(name),
+    if cache_key:
+        response_cache.set(
+            cache_key, CachedResponse(body=response.body, headers=pagination_headers)
         )
 
-    results = (await session.execute(query)).scalars()
+    return response
+
+
+@router.post("/ids")
+async def get_many_by_body(body: BatchIds, session: ReadSessionDep):
+    return await get_many(session, body.ids)
 
-    return JSONResponse(
-        content=jsonable_encoder(
-            [
-                AuthorSchema.model_validate(result, from_attributes=True, by_name=True)
-                for result in results
-            ]
+
+@router.get("/export")
+async def export(
+    session: ReadSessionDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    format: Annotated[FileFormat, Query(alias="formato")] = "ndjson",
+):
+    query = filter_authors(
+        select_authors(), get_dialect_name(session), name, search
+    ).order_by(author_table.c.id)
+
+    return StreamingResponse(
+        export_rows(
+            AuthorSchema,
+            stream_authors(session, query, settings.EXPORT_BATCH_SIZE),
+            format,
         ),
-        headers={"Last-Modified": last_modified.isoformat()} if last_modified else None,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="romancistas.{format}"'},
     )
 
 
-@router.get("/{id}")
+@router.get("/{id}", response_model=AuthorSchema)
 async def get_one(
     id: int,
+    request: Request,
+    response: Response,
     i18n: I18nDep,
-    session: SessionDep,
+    session: ReadSessionDep,
 ):
-    result = await session.get(Author, id)
+    catalog = await get_catalog_version(session, AUTHOR_CATALOG)
+    etag = catalog.etag(id) if catalog else None
+    last_modified = catalog.updated_at if catalog else None
+
+    # a pré-condição só vale para linhas que existem
+    result = await fetch_author(session, id)
 
     if not result:
         raise NotFoundException(entity="author", i18n=i18n)
 
+    if not_modified_response := get_not_modified_response(request, etag, last_modified):
+        return not_modified_response
+
+    response.headers.update(get_caching_headers(etag, last_modified))
+
     return AuthorSchema.model_validate(result, from_attributes=True, by_name=True)
 
 
-@router.post("/", status_code=HTTPStatus.CREATED)
+@router.post("/", status_code=HTTPStatus.CREATED, response_model=AuthorSchema)
 async def create(
-    author: AuthorCreate, i18n: I18nDep, session: SessionDep, _: CurrentUserDep
+    author: AuthorCreate, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep
 ):
     try:
         result = (
@@ -79,6 +239,7 @@ async def create(
             )
         ).scalar_one()
 
+        await bump_catalog_version(session, AUTHOR_CATALOG)
         await session.commit()
         await session.refresh(result)
 
@@ -87,9 +248,113 @@ async def create(
         raise ConflictException(entity="author", i18n=i18n)
 
 
-@router.patch("/{id}")
+@router.post(
+    "/importacao", status_code=HTTPStatus.ACCEPTED, response_model=ImportJobSchema
+)
+async def import_file(
+    file: Annotated[UploadFile, File(alias="arquivo")],
+    response: Response,
+    background_tasks: BackgroundTasks,
+    i18n: I18nDep,
+    session_maker: SessionMakerDep,
+    _: AuthenticatedDep,
+    format: Annotated[FileFormat, Query(alias="formato")] = "ndjson",
+):
+    try:
+        job = await start_import(
+            "author",
+            AuthorCreate,
+            merge_authors,
+            await file.read(),
+            format,
+            session_maker,
+            background_tasks,
+            i18n,
+        )
+    except InvalidFileError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_file"].format(format),
+        )
+
+    if job.status == "finished":
+        response.status_code = HTTPStatus.OK
+    response.headers["Location"] = f"/importacao/{job.id}"
+
+    return ImportJobSchema.model_validate(job, from_attributes=True)
+
+
+def get_batch_selection(
+    session: AsyncSession,
+    i18n: Mapping[str, Any],
+    ids: list[int] | None,
+    name: str | None,
+    search: str | None,
+) -> Select:
+    # termos que a sanitização esvazia não filtram nada na busca
+    if search and not sanitize_name(search):
+        search = None
+
+    # sem ids nem filtros a operação alcançaria o catálogo inteiro
+    if ids is None and not any((name, search)):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["empty_selection"],
+        )
+
+    return select_author_ids(get_dialect_name(session), ids, name, search)
+
+
+@router.patch("/lote", response_model=BatchResult)
+async def update_many(
+    changes: AuthorBatchChanges,
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+):
+    selection = get_batch_selection(session, i18n, ids, name, search)
+    updated_ids = await update_authors(
+        session, selection, changes.model_dump(exclude_none=True)
+    )
+
+    # nacionalidade e nascimento não fazem parte da representação dos livros
+    if updated_ids:
+        await bump_catalog_version(session, AUTHOR_CATALOG)
+        await session.commit()
+
+    return get_batch_result("author", ids, updated_ids, i18n)
+
+
+@router.delete("/lote", response_model=BatchResult)
+async def delete_many(
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+):
+    selection = get_batch_selection(session, i18n, ids, name, search)
+    deleted_ids, with_books = await delete_authors(session, selection)
+
+    # romancistas com livros são mantidos, então os livros não mudam
+    if deleted_ids:
+        await bump_catalog_version(session, AUTHOR_CATALOG)
+        await session.commit()
+
+    return get_batch_result("author", ids, deleted_ids, i18n, with_books)
+
+
+@router.patch("/{id}", response_model=AuthorSchema)
 async def update_author(
-    author: AuthorUpdate, id: int, i18n: I18nDep, session: SessionDep, _: CurrentUserDep
+    author: AuthorUpdate,
+    id: int,
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
 ):
     try:
         query = (
@@ -102,6 +367,8 @@ async def update_author(
         updated_author = (await session.execute(query)).scalar_one_or_none()
 
         if updated_author:
+            # os nomes dos autores fazem parte da representação dos livros
+            await bump_catalog_version(session, AUTHOR_CATALOG, BOOK_CATALOG)
             await session.commit()
             return AuthorSchema.model_validate(
                 updated_author, from_attributes=True, by_name=True
@@ -113,12 +380,15 @@ async def update_author(
 
 
 @router.delete("/{id}")
-async def delete_author(id: int, i18n: I18nDep, session: SessionDep, _: CurrentUserDep):
+async def delete_author(
+    id: int, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep
+):
     deleted_rows = (
         await session.execute(delete(Author).filter(Author.id == id))
     ).rowcount
 
     if deleted_rows == 1:
+        await bump_catalog_version(session, AUTHOR_CATALOG, BOOK_CATALOG)
         await session.commit()
         return {"message": i18n["success"]["delete"].format(i18n["entities"]["author"])}
     elif deleted_rows == 0:
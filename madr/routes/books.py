@@ -1,211 +1,533 @@
+from collections.abc import Mapping
 from http import HTTPStatus
-from typing import Annotated
-from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import delete, select, update, func
+from typing import Annotated, Any
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from pydantic_extra_types.isbn import ISBN
+from sqlalchemy import Select, delete, select
 from sqlalchemy.exc import IntegrityError
-from starlette.responses import JSONResponse
-
-from madr.core.security import CurrentUserDep
-from madr.deps import I18nDep, SessionDep
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.catalog import BOOK_CATALOG, bump_catalog_version, get_catalog_version
+from madr.core.database import get_dialect_name
+from madr.core.imports import InvalidFileError, merge_books, start_import
+from madr.core.orm.mapping import book_table
+from madr.core.security import AuthenticatedDep
+from madr.core.settings import settings
+from madr.deps import I18nDep, ReadSessionDep, SessionDep, SessionMakerDep
 from madr.exceptions import ConflictException, NotFoundException
-from madr.models import Author, Book
-from madr.schema import BookCreate, BookSchema, BookUpdate
-from madr.utils.caching import get_last_modified_response
+from madr.models import Book
+from madr.repositories.books import (
+    BOOK_SORT_KEYS,
+    BookRow,
+    book_json_object,
+    delete_books,
+    fetch_book,
+    fetch_book_by_isbn,
+    fetch_books,
+    fetch_books_by_ids,
+    filter_books,
+    get_authors_names,
+    insert_book,
+    json_array,
+    link_authors,
+    replace_authors,
+    select_book_ids,
+    select_books,
+    stream_books,
+    update_book_columns,
+    update_books,
+    upsert_book,
+)
+from madr.schema import (
+    BatchIds,
+    BatchResult,
+    BookBatchChanges,
+    BookCreate,
+    BookSchema,
+    BookUpdate,
+    BookUpsert,
+    CommaSeparatedIds,
+    ImportJobSchema,
+)
+from madr.utils.caching import (
+    CachedResponse,
+    get_caching_headers,
+    get_not_modified_response,
+    response_cache,
+)
+from madr.utils.batch import get_batch_result, get_missing_ids_headers
+from madr.utils.pagination import (
+    InvalidCursorError,
+    InvalidSortError,
+    get_next_cursor,
+    paginate,
+    parse_sort,
+)
+from madr.utils.sanitization import sanitize_name
+from madr.utils.serialization import (
+    EXPORT_MEDIA_TYPES,
+    FileFormat,
+    book_list_adapter,
+    dump_json_list,
+    export_rows,
+)
 
 router = APIRouter(prefix="/livro", tags=["Livros"])
 
 
+async def check_missing_authors(
+    session: AsyncSession,
+    requested_ids: list[int],
+    found_ids: list[int],
+    i18n: Mapping[str, Any],
+) -> None:
+    if unmatched_ids := [id for id in requested_ids if id not in found_ids]:
+        # a escrita do livro já foi enviada ao banco
+        await session.rollback()
+        raise HTTPException(
+            detail=i18n["exceptions"]["missing_related"].format(
+                i18n["entities"]["author"], unmatched_ids
+            ),
+            status_code=HTTPStatus.NOT_FOUND,
+        )
+
+
+async def get_many(
+    session: AsyncSession, ids: list[int], headers: dict[str, str] | None = None
+) -> Response:
+    results, missing_ids = await fetch_books_by_ids(session, ids)
+
+    return Response(
+        content=dump_json_list(book_list_adapter, results),
+        media_type="application/json",
+        headers={**(headers or {}), **get_missing_ids_headers(missing_ids)},
+    )
+
+
 @router.get("/")
 async def get_list(
     request: Request,
-    session: SessionDep,
+    i18n: I18nDep,
+    session: ReadSessionDep,
     name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
     start_year: Annotated[int | None, Query(alias="ano-inicial")] = None,
     end_year: Annotated[int | None, Query(alias="ano-final")] = None,
-    limit: Annotated[int, Query(alias="limite")] = 20,
-    offset: Annotated[int, Query(alias="deslocamento")] = 0,
+    limit: Annotated[int, Query(alias="limite", ge=1, le=settings.MAX_PAGE_SIZE)] = 20,
+    offset: Annotated[int, Query(alias="deslocamento", ge=0)] = 0,
+    cursor: str | None = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+    sort_by: Annotated[str | None, Query(alias="ordenar")] = None,
 ):
-    last_modified = (
-        await session.execute(select(func.max(Book.created_at)))
-    ).scalar_one_or_none()
+    catalog = await get_catalog_version(session, BOOK_CATALOG)
+    etag = catalog.etag() if catalog else None
+    last_modified = catalog.updated_at if catalog else None
 
-    cache_response = get_last_modified_response(last_modified, request)
+    if not_modified_response := get_not_modified_response(request, etag, last_modified):
+        return not_modified_response
 
-    if cache_response:
-        return cache_response
+    if ids is not None:
+        return await get_many(session, ids, get_caching_headers(etag, last_modified))
 
-    query = select(Book).limit(limit).offset(offset)
+    try:
+        sort = parse_sort(sort_by, BOOK_SORT_KEYS, book_table.c.id)
+    except InvalidSortError as e:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_sort"].format(e),
+        )
 
-    if name:
-        query = query.filter(
-            Book.name.contains(name, autoescape=True),
+    # corpos de sucesso não dependem do idioma, então ele não faz parte da chave
+    cache_key = (
+        (
+            BOOK_CATALOG,
+            catalog.version,
+            name,
+            search,
+            start_year,
+            end_year,
+            sort_by,
+            limit,
+            offset,
+            cursor,
+        )
+        if catalog
+        else None
+    )
+    if cache_key and (cached := response_cache.get(cache_key)):
+        return Response(
+            content=cached.body,
+            media_type="application/json",
+            headers={**get_caching_headers(etag, last_modified), **cached.headers},
         )
 
-    if start_year:
-        query = query.filter(Book.year >= start_year)
-
-    if end_year:
-        query = query.filter(Book.year <= end_year)
-
-    results = (await session.execute(query)).scalars().unique()
-
-    return JSONResponse(
-        content=jsonable_encoder(
-            [
-                BookSchema.model_validate(
-                    {
-                        **result.__dict__,
-                        **{"authors_names": [author.name for author in result.authors]},
-                    },
-                    by_name=True,
-                )
-                for result in results
-            ]
-        ),
-        headers={"Last-Modified": last_modified.isoformat()} if last_modified else None,
+    dialect_name = get_dialect_name(session)
+
+    # no Postgres o próprio banco monta o JSON de cada livro, as colunas da
+    # ordenação acompanham o JSON para gerar o cursor
+    if dialect_name == "postgresql":
+        query = select(*(key.column for key in sort), book_json_object())
+    else:
+        query = select_books()
+
+    # a ordenação por relevância não é estável entre páginas, então não é
+    # possível continuar a partir de um cursor
+    if search and cursor:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_cursor"],
+        )
+
+    query = filter_books(query, dialect_name, name, search, start_year, end_year)
+
+    try:
+        query = paginate(query, sort, limit, offset, cursor)
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_cursor"],
+        )
+
+    if dialect_name == "postgresql":
+        results = (await session.execute(query)).all()
+        body = json_array(result.json for result in results)
+    else:
+        results = await fetch_books(session, query)
+        body = dump_json_list(book_list_adapter, results)
+
+    pagination_headers = {}
+    if not search and (next_cursor := get_next_cursor(results, sort, limit)):
+        pagination_headers["X-Next-Cursor"] = next_cursor
+
+    response = Response(
+        content=body,
+        media_type="application/json",
+        headers={**get_caching_headers(etag, last_modified), **pagination_headers},
     )
 
+    if cache_key:
+        response_cache.set(
+            cache_key, CachedResponse(body=response.body, headers=pagination_headers)
+        )
+
+    return response
+
 
-@router.get("/{id}")
-async def get_one(id: int, i18n: I18nDep, session: SessionDep):
-    result = (
-        (await session.execute(select(Book).filter(Book.id == id)))
-        .unique()
-        .scalar_one_or_none()
+@router.post("/ids")
+async def get_many_by_body(body: BatchIds, session: ReadSessionDep):
+    return await get_many(session, body.ids)
+
+
+@router.get("/export")
+async def export(
+    session: ReadSessionDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    start_year: Annotated[int | None, Query(alias="ano-inicial")] = None,
+    end_year: Annotated[int | None, Query(alias="ano-final")] = None,
+    format: Annotated[FileFormat, Query(alias="formato")] = "ndjson",
+):
+    query = filter_books(
+        select_books(), get_dialect_name(session), name, search, start_year, end_year
+    ).order_by(book_table.c.id)
+
+    return StreamingResponse(
+        export_rows(
+            BookSchema, stream_books(session, query, settings.EXPORT_BATCH_SIZE), format
+        ),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="livros.{format}"'},
     )
 
+
+@router.get("/{id}", response_model=BookSchema)
+async def get_one(
+    id: int,
+    request: Request,
+    response: Response,
+    i18n: I18nDep,
+    session: ReadSessionDep,
+):
+    catalog = await get_catalog_version(session, BOOK_CATALOG)
+    etag = catalog.etag(id) if catalog else None
+    last_modified = catalog.updated_at if catalog else None
+
+    # a pré-condição só vale para linhas que existem
+    result = await fetch_book(session, id)
+
     if not result:
         raise NotFoundException(entity="book", i18n=i18n)
 
+    if not_modified_response := get_not_modified_response(request, etag, last_modified):
+        return not_modified_response
+
+    response.headers.update(get_caching_headers(etag, last_modified))
+
+    return BookSchema.model_validate(result, from_attributes=True, by_name=True)
+
+
+@router.get("/isbn/{isbn}", response_model=BookSchema)
+async def get_by_isbn(
+    isbn: ISBN,
+    request: Request,
+    response: Response,
+    i18n: I18nDep,
+    session: ReadSessionDep,
+):
+    catalog = await get_catalog_version(session, BOOK_CATALOG)
+    etag = catalog.etag("isbn", isbn) if catalog else None
+    last_modified = catalog.updated_at if catalog else None
+
+    # a pré-condição só vale para linhas que existem
+    result = await fetch_book_by_isbn(session, isbn)
+
+    if not result:
+        raise NotFoundException(entity="book", i18n=i18n)
+
+    if not_modified_response := get_not_modified_response(request, etag, last_modified):
+        return not_modified_response
+
+    response.headers.update(get_caching_headers(etag, last_modified))
+
+    return BookSchema.model_validate(result, from_attributes=True, by_name=True)
+
+
+@router.put("/isbn/{isbn}", response_model=BookSchema)
+async def upsert_by_isbn(
+    isbn: ISBN,
+    book: BookUpsert,
+    response: Response,
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
+):
+    try:
+        upserted = await upsert_book(
+            session, {"isbn": isbn, "name": book.name, "year": book.year}
+        )
+        changed = upserted is not None
+        created = changed and upserted.created
+
+        # reenvios idênticos não escrevem nada nem invalidam o catálogo
+        if not upserted:
+            upserted = (
+                await session.execute(select_books().filter(book_table.c.isbn == isbn))
+            ).one()
+
+        if book.author_ids is None:
+            authors_names = (await get_authors_names(session, [upserted.id])).get(
+                upserted.id, []
+            )
+        else:
+            authors, authors_changed = await replace_authors(
+                session, upserted.id, book.author_ids
+            )
+            author_ids = [author.id for author in authors]
+            await check_missing_authors(session, book.author_ids, author_ids, i18n)
+
+            changed = changed or authors_changed
+            authors_names = [author.name for author in authors]
+
+        if changed:
+            await bump_catalog_version(session, BOOK_CATALOG)
+            await session.commit()
+    except IntegrityError:
+        raise ConflictException(entity="book", i18n=i18n)
+
+    if created:
+        response.status_code = HTTPStatus.CREATED
+
     return BookSchema.model_validate(
-        {
-            **result.__dict__,
-            "authors_names": [author.name for author in result.authors],
-        },
+        BookRow(
+            upserted.id, upserted.isbn, upserted.name, upserted.year, authors_names
+        ),
+        from_attributes=True,
         by_name=True,
     )
 
 
-@router.post("/", status_code=HTTPStatus.CREATED)
+@router.post("/", status_code=HTTPStatus.CREATED, response_model=BookSchema)
 async def create(
-    book: BookCreate, i18n: I18nDep, session: SessionDep, _: CurrentUserDep
+    book: BookCreate, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep
 ):
     try:
-        book_instance = Book(**book.model_dump(exclude={"author_ids"}))
-        authors_to_add = (
-            (
-                await session.execute(
-                    select(Author).filter(Author.id.in_(book.author_ids))
-                )
-            )
-            .scalars()
-            .all()
+        created = await insert_book(session, book.model_dump(exclude={"author_ids"}))
+        authors = await link_authors(session, created.id, book.author_ids)
+        await check_missing_authors(
+            session, book.author_ids, [author.author_id for author in authors], i18n
         )
 
-        if len(authors_to_add) != len(book.author_ids):
-            existing_ids = [author.id for author in authors_to_add]
-
-            unmatched_ids = [
-                author_id
-                for author_id in book.author_ids
-                if author_id not in existing_ids
-            ]
-            raise HTTPException(
-                detail=i18n["exceptions"]["missing_related"].format(
-                    i18n["entities"]["author"], unmatched_ids
-                ),
-                status_code=404,
-            )
+        await bump_catalog_version(session, BOOK_CATALOG)
+        await session.commit()
+    except IntegrityError:
+        raise ConflictException(entity="book", i18n=i18n)
 
-        book_instance.authors.extend(authors_to_add)
+    return BookSchema.model_validate(
+        BookRow(*created, [author.name for author in authors]),
+        from_attributes=True,
+        by_name=True,
+    )
 
-        session.add(book_instance)
 
-        await session.commit()
+@router.post(
+    "/importacao", status_code=HTTPStatus.ACCEPTED, response_model=ImportJobSchema
+)
+async def import_file(
+    file: Annotated[UploadFile, File(alias="arquivo")],
+    response: Response,
+    background_tasks: BackgroundTasks,
+    i18n: I18nDep,
+    session_maker: SessionMakerDep,
+    _: AuthenticatedDep,
+    format: Annotated[FileFormat, Query(alias="formato")] = "ndjson",
+):
+    try:
+        job = await start_import(
+            "book",
+            BookCreate,
+            merge_books,
+            await file.read(),
+            format,
+            session_maker,
+            background_tasks,
+            i18n,
+        )
+    except InvalidFileError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["invalid_file"].format(format),
+        )
+
+    if job.status == "finished":
+        response.status_code = HTTPStatus.OK
+    response.headers["Location"] = f"/importacao/{job.id}"
 
-        await session.refresh(book_instance)
+    return ImportJobSchema.model_validate(job, from_attributes=True)
 
-        response = BookSchema.model_validate(
-            {
-                **book_instance.__dict__,
-                "authors_names": [author.name for author in book_instance.authors],
-            },
-            by_name=True,
+
+def get_batch_selection(
+    session: AsyncSession,
+    i18n: Mapping[str, Any],
+    ids: list[int] | None,
+    name: str | None,
+    search: str | None,
+    start_year: int | None,
+    end_year: int | None,
+) -> Select:
+    # termos que a sanitização esvazia não filtram nada na busca
+    if search and not sanitize_name(search):
+        search = None
+
+    # sem ids nem filtros a operação alcançaria o catálogo inteiro
+    if ids is None and not any((name, search, start_year, end_year)):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=i18n["exceptions"]["empty_selection"],
         )
-        return response
 
-    except IntegrityError:
-        raise ConflictException(entity="book", i18n=i18n)
+    return select_book_ids(
+        get_dialect_name(session), ids, name, search, start_year, end_year
+    )
+
+
+@router.patch("/lote", response_model=BatchResult)
+async def update_many(
+    changes: BookBatchChanges,
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    start_year: Annotated[int | None, Query(alias="ano-inicial")] = None,
+    end_year: Annotated[int | None, Query(alias="ano-final")] = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+):
+    selection = get_batch_selection(
+        session, i18n, ids, name, search, start_year, end_year
+    )
+    updated_ids = await update_books(session, selection, changes.model_dump())
+
+    if updated_ids:
+        await bump_catalog_version(session, BOOK_CATALOG)
+        await session.commit()
+
+    return get_batch_result("book", ids, updated_ids, i18n)
 
 
-@router.patch("/{id}")
+@router.delete("/lote", response_model=BatchResult)
+async def delete_many(
+    i18n: I18nDep,
+    session: SessionDep,
+    _: AuthenticatedDep,
+    name: Annotated[str | None, Query(alias="nome")] = None,
+    search: Annotated[str | None, Query(alias="busca")] = None,
+    start_year: Annotated[int | None, Query(alias="ano-inicial")] = None,
+    end_year: Annotated[int | None, Query(alias="ano-final")] = None,
+    ids: Annotated[CommaSeparatedIds, Query(max_length=settings.MAX_BATCH_IDS)] = None,
+):
+    selection = get_batch_selection(
+        session, i18n, ids, name, search, start_year, end_year
+    )
+    deleted_ids = await delete_books(session, selection)
+
+    if deleted_ids:
+        await bump_catalog_version(session, BOOK_CATALOG)
+        await session.commit()
+
+    return get_batch_result("book", ids, deleted_ids, i18n)
+
+
+@router.patch("/{id}", response_model=BookSchema)
 async def update_book(
-    id: int, book: BookUpdate, i18n: I18nDep, session: SessionDep, _: CurrentUserDep
+    id: int, book: BookUpdate, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep
 ):
+    values = {
+        k: v
+        for (k, v) in book.model_dump(exclude={"author_ids"}).items()
+        if v is not None
+    }
+
     try:
-        query = (
-            update(Book)
-            .values(
-                {
-                    k: v
-                    for (k, v) in book.model_dump().items()
-                    if v is not None and k in Book.__annotations__
-                }
-            )
-            .filter(Book.id == id)
-            .returning(Book)
-        )
-        updated_book = (await session.execute(query)).unique().scalar_one_or_none()
-        if updated_book:
-            if book.author_ids is not None:
-                authors_to_use = (
-                    (
-                        await session.execute(
-                            select(Author).filter(Author.id.in_(book.author_ids))
-                        )
-                    )
-                    .scalars()
-                    .all()
-                )
-                if len(authors_to_use) != len(book.author_ids):
-                    existing_ids = [author.id for author in authors_to_use]
-
-                    unmatched_ids = [
-                        author_id
-                        for author_id in book.author_ids
-                        if author_id not in existing_ids
-                    ]
-                    raise HTTPException(
-                        detail=i18n["exceptions"]["missing_related"].format(
-                            i18n["entities"]["author"], unmatched_ids
-                        ),
-                        status_code=404,
-                    )
-                await session.refresh(updated_book)
-                updated_book.authors = list(authors_to_use)
+        updated = await update_book_columns(session, id, values)
+        if not updated:
+            raise NotFoundException(entity="book", i18n=i18n)
 
-            await session.commit()
-            await session.refresh(updated_book)
-
-            return BookSchema.model_validate(
-                {
-                    **updated_book.__dict__,
-                    "authors_names": [author.name for author in updated_book.authors],
-                },
-                by_name=True,
-            )
+        if book.author_ids is None:
+            authors_names = (await get_authors_names(session, [id])).get(id, [])
         else:
-            raise NotFoundException(entity="book", i18n=i18n)
+            # só os vínculos que mudaram são removidos ou inseridos
+            authors, _ = await replace_authors(session, id, book.author_ids)
+            author_ids = [author.id for author in authors]
+            await check_missing_authors(session, book.author_ids, author_ids, i18n)
+
+            authors_names = [author.name for author in authors]
+
+        await bump_catalog_version(session, BOOK_CATALOG)
+        await session.commit()
     except IntegrityError:
         raise ConflictException(entity="book", i18n=i18n)
 
+    return BookSchema.model_validate(
+        BookRow(*updated, authors_names), from_attributes=True, by_name=True
+    )
+
 
 @router.delete("/{id}")
-async def delete_book(id: int, i18n: I18nDep, session: SessionDep, _: CurrentUserDep):
+async def delete_book(id: int, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep):
     deleted_rows = (await session.execute(delete(Book).filter(Book.id == id))).rowcount
 
     if deleted_rows == 1:
+        await bump_catalog_version(session, BOOK_CATALOG)
         await session.commit()
         return {"message": i18n["success"]["delete"].format(i18n["entities"]["book"])}
     elif deleted_rows == 0:
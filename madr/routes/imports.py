@@ -0,0 +1,24 @@
+from uuid import UUID
+
+from fastapi import APIRouter
+
+from madr.core.imports import get_job
+from madr.core.security import AuthenticatedDep
+from madr.deps import I18nDep, SessionDep
+from madr.exceptions import NotFoundException
+from madr.schema import ImportJobSchema
+
+router = APIRouter(prefix="/importacao", tags=["Importação"])
+
+
+@router.get("/{id}", response_model=ImportJobSchema)
+async def get_progress(
+    id: UUID, i18n: I18nDep, session: SessionDep, _: AuthenticatedDep
+):
+    # o progresso é lido do primário, uma réplica atrasada mostraria lotes antigos
+    job = await get_job(session, id)
+
+    if not job:
+        raise NotFoundException(entity="import", i18n=i18n)
+
+    return ImportJobSchema.model_validate(job, from_attributes=True)
@@ -0,0 +1,84 @@
+from collections.abc import Iterator
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from madr.core import database
+from madr.core.database import get_pool_stats
+from madr.core.metrics import Family, registry, render
+from madr.core.security import decoded_tokens, user_versions
+from madr.utils.caching import TTLCache, response_cache
+
+router = APIRouter(tags=["Status"])
+
+caches: dict[str, TTLCache] = {
+    "response": response_cache,
+    "decoded_tokens": decoded_tokens,
+    "user_versions": user_versions,
+}
+
+
+def collect_caches() -> Iterator[Family]:
+    families = {
+        stat: Family(name, type, help)
+        for stat, name, type, help in [
+            ("hits", "madr_cache_hits_total", "counter", "Leituras encontradas"),
+            ("misses", "madr_cache_misses_total", "counter", "Leituras sem entrada"),
+            (
+                "evictions",
+                "madr_cache_evictions_total",
+                "counter",
+                "Entradas descartadas por expiração ou limite",
+            ),
+            ("entries", "madr_cache_entries", "gauge", "Entradas no cache"),
+            (
+                "hit_ratio",
+                "madr_cache_hit_ratio",
+                "gauge",
+                "Proporção de leituras encontradas",
+            ),
+        ]
+    }
+    for name, cache in caches.items():
+        stats = cache.stats()
+        for stat, family in families.items():
+            family.samples[(family.name, (("cache", name),))] = stats[stat]
+    yield from families.values()
+
+
+POOL_STATS_HELP = {
+    "size": "Tamanho do pool",
+    "checkedin": "Conexões livres no pool",
+    "checkedout": "Conexões em uso",
+    "overflow": "Conexões abertas além do tamanho do pool",
+}
+
+
+def collect_pool() -> Iterator[Family]:
+    engines = {"primary": database.engine}
+    engines.update(
+        (f"replica-{index}", replica)
+        for index, replica in enumerate(database.replica_selector.engines)
+    )
+
+    families = {
+        stat: Family(f"madr_db_pool_{stat}", "gauge", help)
+        for stat, help in POOL_STATS_HELP.items()
+    }
+    for name, engine in engines.items():
+        for stat, value in get_pool_stats(engine).items():
+            family = families[stat]
+            family.samples[(family.name, (("engine", name),))] = value
+    yield from families.values()
+
+
+registry.add_collector(collect_caches)
+registry.add_collector(collect_pool)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        render(registry.aggregate()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,37 @@
+import asyncio
+from http import HTTPStatus
+
+from fastapi import APIRouter, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from madr.core.database import get_pool_stats
+from madr.core.settings import settings
+from madr.deps import SessionMakerDep
+from madr.utils.caching import response_cache
+
+router = APIRouter(prefix="/status", tags=["Status"])
+
+
+@router.get("/cache")
+async def cache_stats():
+    return response_cache.stats()
+
+
+@router.get("/pronto")
+async def readiness(response: Response, session_maker: SessionMakerDep):
+    """
+    Pronto quando uma conexão do pool responde dentro do prazo, um pool
+    esgotado ou um banco fora do ar tiram a instância do balanceamento
+    """
+    try:
+        async with asyncio.timeout(settings.READINESS_TIMEOUT):
+            async with session_maker() as session:
+                await session.execute(text("SELECT 1"))
+        database = "ok"
+    except (SQLAlchemyError, OSError, TimeoutError):
+        database = "indisponível"
+        response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+    engine = session_maker.kw["bind"]
+    return {"banco": database, "pool": get_pool_stats(engine)}
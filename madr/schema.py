@@ -1,5 +1,5 @@
 from datetime import date
-from typing import Annotated
+from typing import Annotated, Literal, Self
 from uuid import UUID
 
 from pydantic import (
@@ -8,11 +8,18 @@ from pydantic import (
     ConfigDict,
     EmailStr,
     Field,
+    model_validator,
 )
 from pydantic_extra_types.isbn import ISBN
 
-from madr.core.security import hash_password
-from madr.utils.sanitization import sanitize_name
+from madr.core.settings import settings
+from madr.utils.sanitization import sanitize_name, split_comma_separated
+
+CommaSeparatedIds = Annotated[list[int] | None, BeforeValidator(split_comma_separated)]
+
+
+class BatchIds(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=settings.MAX_BATCH_IDS)
 
 
 class AccessToken(BaseModel):
@@ -30,9 +37,8 @@ class UserBase(BaseModel):
 
 
 class UserCreate(UserBase):
-    password: Annotated[str, BeforeValidator(hash_password)] = Field(
-        alias="senha", min_length=8
-    )
+    # o hash é feito pelas rotas, fora do event loop
+    password: str = Field(alias="senha", min_length=8)
 
 
 class UserSchema(UserBase):
@@ -51,6 +57,20 @@ class BookCreate(BookBase):
     author_ids: list[int] = Field(alias="ids_romancistas", default=[])
 
 
+class BookUpsert(BaseModel):
+    name: Annotated[str, BeforeValidator(sanitize_name)] = Field(alias="nome")
+    year: int = Field(alias="ano")
+    author_ids: list[int] | None = Field(default=None, alias="ids_romancistas")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+
+class BookBatchChanges(BaseModel):
+    year: int = Field(alias="ano")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+
 class BookUpdate(BaseModel):
     isbn: ISBN | None = None
     name: Annotated[str | None, BeforeValidator(sanitize_name)] = Field(
@@ -82,9 +102,57 @@ class AuthorSchema(AuthorBase):
 class AuthorCreate(AuthorBase): ...
 
 
+class AuthorBatchChanges(BaseModel):
+    nationality: str | None = Field(default=None, alias="nacionalidade")
+    birth_date: date | None = Field(default=None, alias="data-nascimento")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+    @model_validator(mode="after")
+    def check_not_empty(self) -> Self:
+        if self.nationality is None and self.birth_date is None:
+            raise ValueError("nacionalidade ou data-nascimento é obrigatório")
+        return self
+
+
 class AuthorUpdate(BaseModel):
     name: str | None
     nationality: str | None = Field(alias="nacionalidade")
     birth_date: date | None = Field(alias="data-nascimento")
 
     model_config = ConfigDict(validate_by_name=True)
+
+
+class BatchFailure(BaseModel):
+    id: int
+    reason: str = Field(alias="motivo")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+
+class BatchResult(BaseModel):
+    affected: int = Field(alias="afetados")
+    failures: list[BatchFailure] = Field(alias="falhas")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+
+ImportStatus = Literal["pending", "running", "finished", "failed"]
+
+
+class ImportConflictSchema(BaseModel):
+    line: int = Field(alias="linha")
+    reason: str = Field(alias="motivo")
+
+    model_config = ConfigDict(validate_by_name=True)
+
+
+class ImportJobSchema(BaseModel):
+    id: UUID
+    status: ImportStatus
+    total: int | None
+    processed: int = Field(alias="processados")
+    inserted: int = Field(alias="inseridos")
+    conflicts: list[ImportConflictSchema] = Field(alias="conflitos")
+
+    model_config = ConfigDict(validate_by_name=True)
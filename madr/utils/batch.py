@@ -0,0 +1,59 @@
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any, TypeVar
+
+from madr.schema import BatchFailure, BatchResult
+
+T = TypeVar("T")
+
+
+def order_by_ids(rows: Iterable[T], ids: Sequence[int]) -> tuple[list[T], list[int]]:
+    """
+    Devolve as linhas na ordem dos ids pedidos, sem repetições, junto dos ids
+    que não foram encontrados
+    """
+    rows_by_id: dict[Any, T] = {row.id: row for row in rows}  # type: ignore[attr-defined]
+    ordered_ids = list(dict.fromkeys(ids))
+
+    return (
+        [rows_by_id[id] for id in ordered_ids if id in rows_by_id],
+        [id for id in ordered_ids if id not in rows_by_id],
+    )
+
+
+def get_missing_ids_headers(missing_ids: Sequence[int]) -> dict[str, str]:
+    if not missing_ids:
+        return {}
+    return {"X-Missing-Ids": ",".join(map(str, missing_ids))}
+
+
+def get_batch_result(
+    entity: str,
+    ids: Sequence[int] | None,
+    affected: Sequence[int],
+    i18n: Mapping[str, Any],
+    with_books: Sequence[int] = (),
+) -> BatchResult:
+    """
+    Resume uma operação em lote, com uma falha para cada romancista mantido
+    por possuir livros e para cada id pedido que não foi encontrado
+    """
+    entity_name = i18n["entities"][entity]
+    failures = [
+        BatchFailure(
+            id=id, reason=i18n["exceptions"]["has_books"].format(entity_name, id)
+        )
+        for id in with_books
+    ]
+
+    if ids is not None:
+        found_ids = {*affected, *with_books}
+        failures.extend(
+            BatchFailure(
+                id=id,
+                reason=i18n["exceptions"]["not_found_id"].format(entity_name, id),
+            )
+            for id in dict.fromkeys(ids)
+            if id not in found_ids
+        )
+
+    return BatchResult(affected=len(affected), failures=failures)
@@ -1,20 +1,191 @@
-from datetime import datetime
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
 from http import HTTPStatus
+from typing import Any, Generic, TypeVar
+from zoneinfo import ZoneInfo
+import time
 from fastapi import Request, Response
 
+from madr.core.settings import settings
 
-def get_last_modified_response(
-    last_modified: datetime, request: Request
+
+def format_http_date(value: datetime) -> str:
+    """
+    Formata uma data no formato IMF-fixdate usado pelos cabeçalhos HTTP
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=ZoneInfo("UTC"))
+    # usegmt exige exatamente timezone.utc, não aceita ZoneInfo("UTC")
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo("UTC"))
+    return parsed
+
+
+def make_weak_etag(*parts: Any) -> str:
+    """
+    Gera uma ETag fraca a partir das versões que definem a representação
+    """
+    digest = blake2b("|".join(map(str, parts)).encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match sempre usa a comparação fraca
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    headers: Mapping[str, str], etag: str | None, last_modified: datetime | None
+) -> bool:
+    """
+    Avalia as pré-condições de um GET segundo a RFC 9110, If-Modified-Since
+    é ignorado quando a requisição também envia If-None-Match
+    """
+    if "if-none-match" in headers:
+        return etag is not None and _etag_matches(headers["if-none-match"], etag)
+
+    if last_modified is not None and "if-modified-since" in headers:
+        modified_since = parse_http_date(headers["if-modified-since"])
+        # datas HTTP têm precisão de segundos
+        return (
+            modified_since is not None
+            and last_modified.replace(microsecond=0) <= modified_since
+        )
+
+    return False
+
+
+def get_caching_headers(
+    etag: str | None = None, last_modified: datetime | None = None
+) -> dict[str, str]:
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
+
+def get_not_modified_response(
+    request: Request, etag: str | None = None, last_modified: datetime | None = None
 ) -> Response | None:
     """
-    Returns a NOT MODIFIED blank response only if the
-    last_modified date is older than the if-modified-since header
-    """
-    if "if-modified-since" in request.headers:
-        if last_modified <= datetime.fromisoformat(
-            request.headers["if-modified-since"]
-        ):
-            return Response(
-                headers={"Last-Modified": last_modified.isoformat()},
-                status_code=HTTPStatus.NOT_MODIFIED,
-            )
+    Returns a NOT MODIFIED blank response only if the request preconditions
+    match the current etag or last_modified date
+    """
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(
+            headers=get_caching_headers(etag, last_modified),
+            status_code=HTTPStatus.NOT_MODIFIED,
+        )
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Cache LRU limitado com expiração, local a cada processo
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key: K) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    headers: dict[str, str]
+
+
+class ResponseCache(TTLCache[tuple[Hashable, ...], CachedResponse]):
+    """
+    Corpos de resposta já serializados. As chaves são tuplas cujo primeiro
+    elemento é o catálogo da resposta, usado para invalidar todas as entradas
+    dele após escritas
+    """
+
+    def invalidate(self, *catalogs: str) -> None:
+        for key in [key for key in self._entries if key[0] in catalogs]:
+            self.discard(key)
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES, ttl=settings.RESPONSE_CACHE_TTL
+)
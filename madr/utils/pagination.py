@@ -0,0 +1,156 @@
+import base64
+import binascii
+import json
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import (
+    BigInteger,
+    ColumnElement,
+    Select,
+    SmallInteger,
+    and_,
+    or_,
+    tuple_,
+)
+
+
+class InvalidCursorError(ValueError): ...
+
+
+class InvalidSortError(ValueError): ...
+
+
+@dataclass(frozen=True)
+class SortKey:
+    column: ColumnElement
+    descending: bool = False
+
+    def order_by(self) -> ColumnElement:
+        return self.column.desc() if self.descending else self.column.asc()
+
+
+def parse_sort(
+    value: str | None, allowed: Mapping[str, ColumnElement], tiebreaker: ColumnElement
+) -> list[SortKey]:
+    """
+    Converte o parâmetro de ordenação, como `ano,-nome`, em chaves de
+    ordenação, aceitando só as colunas indexadas permitidas e sempre
+    terminando pelo desempate na chave primária
+    """
+    keys: list[SortKey] = []
+
+    for field in (value or "").split(","):
+        field = field.strip()
+        if not field:
+            continue
+
+        name = field.removeprefix("-")
+        if name not in allowed or any(key.column is allowed[name] for key in keys):
+            raise InvalidSortError(field)
+        keys.append(SortKey(allowed[name], descending=field.startswith("-")))
+
+    if not any(key.column is tiebreaker for key in keys):
+        keys.append(SortKey(tiebreaker))
+
+    return keys
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Codifica os valores da chave de ordenação da última linha de uma página
+    em um token opaco e seguro para uso em query strings
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise InvalidCursorError(cursor)
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(cursor)
+
+    return values
+
+
+def _fits_column(column: ColumnElement, value: Any) -> bool:
+    python_type = column.type.python_type
+
+    # bool é subclasse de int e inteiros fora da faixa da coluna estourariam
+    # no driver
+    if python_type is int:
+        if isinstance(column.type, BigInteger):
+            bits = 63
+        elif isinstance(column.type, SmallInteger):
+            bits = 15
+        else:
+            bits = 31
+        return (
+            isinstance(value, int)
+            and not isinstance(value, bool)
+            and -(2**bits) <= value < 2**bits
+        )
+
+    return isinstance(value, python_type)
+
+
+def _after(sort: Sequence[SortKey], values: Sequence[Any]) -> ColumnElement[bool]:
+    if all(key.descending == sort[0].descending for key in sort):
+        columns, cursor_values = tuple_(*(key.column for key in sort)), tuple_(*values)
+        return (
+            columns < cursor_values if sort[0].descending else columns > cursor_values
+        )
+
+    # com direções misturadas a comparação de tuplas não serve, então cada
+    # chave desempata as anteriores
+    conditions = []
+    for index, (key, value) in enumerate(zip(sort, values)):
+        previous = [other.column == values[i] for i, other in enumerate(sort[:index])]
+        after = key.column < value if key.descending else key.column > value
+        conditions.append(and_(*previous, after))
+    return or_(*conditions)
+
+
+def paginate(
+    query: Select,
+    sort: Sequence[SortKey],
+    limit: int,
+    offset: int,
+    cursor: str | None,
+) -> Select:
+    """
+    Aplica uma ordenação estável à consulta e pagina por deslocamento ou,
+    quando um cursor é informado, pelo conjunto de chaves (keyset) da última
+    linha vista, o que permite usar o índice da ordenação sem varrer as
+    linhas anteriores
+    """
+    query = query.order_by(*(key.order_by() for key in sort)).limit(limit)
+
+    if cursor is None:
+        return query.offset(offset)
+
+    values = decode_cursor(cursor, len(sort))
+    # cursores de outra ordenação teriam valores de outro tipo
+    if not all(_fits_column(key.column, value) for key, value in zip(sort, values)):
+        raise InvalidCursorError(cursor)
+
+    return query.filter(_after(sort, values))
+
+
+def get_next_cursor(
+    rows: Sequence[Any], sort: Sequence[SortKey], limit: int
+) -> str | None:
+    """
+    Gera o cursor da próxima página, somente se a página atual estiver cheia
+    """
+    if not rows or len(rows) < limit:
+        return None
+
+    last_row = rows[-1]
+    return encode_cursor([getattr(last_row, key.column.key) for key in sort])
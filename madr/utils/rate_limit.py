@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import time
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket por cliente, mantém no máximo `max_clients` buckets e
+    descarta os usados há mais tempo
+    """
+
+    def __init__(self, capacity: int, refill_rate: float, max_clients: int) -> None:
+        # sem reposição um cliente bloqueado nunca teria um prazo para tentar
+        if refill_rate <= 0:
+            raise ValueError("refill_rate deve ser positiva")
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def acquire(self, key: str) -> float:
+        """
+        Consome um token do cliente e retorna 0, ou, se não houver tokens,
+        quantos segundos faltam para o próximo
+        """
+        now = time.monotonic()
+        tokens, last_refill = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - last_refill) * self.refill_rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.refill_rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def clear(self) -> None:
+        self._buckets.clear()
@@ -6,3 +6,14 @@ def sanitize_name(name: str):
     without_numbers = re.sub(r"[0-9]", "", without_extra_whitespace)
     alpha_lowercase_only = re.sub(r"[^\w ]", "", without_numbers.lower())
     return alpha_lowercase_only
+
+
+def split_comma_separated(value: str | list[str] | None):
+    """
+    Aceita listas tanto em parâmetros repetidos quanto separadas por vírgula
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    return [part for item in value for part in item.split(",") if part.strip()]
@@ -0,0 +1,84 @@
+import csv
+import io
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Sequence
+from functools import cache
+from typing import Any, Literal, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+from madr.core.instrumentation import timed
+from madr.schema import AuthorSchema, BookSchema
+
+T = TypeVar("T")
+
+FileFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES: dict[FileFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+@cache
+def get_list_adapter(schema: type[BaseModel]) -> TypeAdapter[list[Any]]:
+    return TypeAdapter(list[schema])
+
+
+book_list_adapter = get_list_adapter(BookSchema)
+author_list_adapter = get_list_adapter(AuthorSchema)
+
+
+def dump_json_list(adapter: TypeAdapter[list[T]], rows: Iterable[Any]) -> bytes:
+    """
+    Valida as linhas direto dos atributos e serializa a lista em bytes pelo
+    núcleo do pydantic, sem passar por dicionários nem pelo json da stdlib
+    """
+    with timed("serialize"):
+        return adapter.dump_json(
+            adapter.validate_python(rows, from_attributes=True), by_alias=True
+        )
+
+
+def _csv_lines(rows: Iterable[Iterable[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_value(value: Any) -> Any:
+    return "; ".join(map(str, value)) if isinstance(value, list) else value
+
+
+async def export_rows(
+    schema: type[BaseModel],
+    batches: AsyncIterable[Sequence[Any]],
+    format: FileFormat,
+) -> AsyncIterator[bytes]:
+    """
+    Serializa lotes de linhas em NDJSON ou CSV à medida que são lidos do
+    banco, com as mesmas chaves das respostas JSON
+    """
+    adapter = get_list_adapter(schema)
+
+    if format == "csv":
+        yield _csv_lines(
+            [[field.alias or name for name, field in schema.model_fields.items()]]
+        )
+
+    async for rows in batches:
+        items = adapter.validate_python(rows, from_attributes=True)
+
+        if format == "ndjson":
+            yield b"".join(
+                item.model_dump_json(by_alias=True).encode() + b"\n" for item in items
+            )
+        else:
+            yield _csv_lines(
+                [
+                    [
+                        _csv_value(value)
+                        for value in item.model_dump(mode="json").values()
+                    ]
+                    for item in items
+                ]
+            )
@@ -0,0 +1,45 @@
+"""add name search indexes
+
+Revision ID: 4d2f8a1c9e37
+Revises: bcf7fba43718
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "4d2f8a1c9e37"
+down_revision: Union[str, Sequence[str], None] = "bcf7fba43718"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for table in ("author", "book"):
+        op.create_index(
+            f"ix_{table}_name_trgm",
+            table,
+            ["name"],
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        )
+        op.create_index(
+            f"ix_{table}_name_tsv",
+            table,
+            [sa.text("to_tsvector('simple', name)")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("author", "book"):
+        op.drop_index(f"ix_{table}_name_tsv", table_name=table)
+        op.drop_index(f"ix_{table}_name_trgm", table_name=table)
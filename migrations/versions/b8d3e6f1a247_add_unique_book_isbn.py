@@ -0,0 +1,61 @@
+"""add unique book isbn
+
+Revision ID: b8d3e6f1a247
+Revises: e5a90c3f7b12
+Create Date: 2026-10-18 15:02:41.223904
+
+"""
+
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+from pydantic_extra_types.isbn import isbn13_digit_calc
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d3e6f1a247"
+down_revision: Union[str, Sequence[str], None] = "e5a90c3f7b12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def normalize_isbn(value: str) -> str:
+    """
+    Mesmo formato gravado pelo tipo ISBN dos schemas, somente dígitos e
+    ISBN-10 convertido para ISBN-13
+    """
+    value = value.replace("-", "").replace(" ", "").upper()
+    if len(value) == 10:
+        base = f"978{value[:-1]}"
+        return f"{base}{isbn13_digit_calc(base)}"
+    return value
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    book = sa.table("book", sa.column("id", sa.Integer), sa.column("isbn", sa.String))
+
+    rows = connection.execute(
+        sa.select(book.c.id, book.c.isbn).where(book.c.isbn.is_not(None))
+    ).all()
+    normalized = {id: normalize_isbn(isbn) for id, isbn in rows}
+
+    if duplicated := [
+        isbn for isbn, count in Counter(normalized.values()).items() if count > 1
+    ]:
+        raise RuntimeError(f"ISBNs repetidos precisam ser corrigidos: {duplicated}")
+
+    for id, isbn in rows:
+        if normalized[id] != isbn:
+            connection.execute(
+                sa.update(book).where(book.c.id == id).values(isbn=normalized[id])
+            )
+
+    op.create_unique_constraint(op.f("uq_book_isbn"), "book", ["isbn"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f("uq_book_isbn"), "book", type_="unique")
@@ -0,0 +1,53 @@
+"""add updated_at and catalog version
+
+Revision ID: c71e0b5d2a94
+Revises: 4d2f8a1c9e37
+Create Date: 2026-10-18 10:02:17.540931
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c71e0b5d2a94"
+down_revision: Union[str, Sequence[str], None] = "4d2f8a1c9e37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("author", "book"):
+        op.add_column(
+            table,
+            sa.Column(
+                "updated_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.text("current_timestamp"),
+            ),
+        )
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+
+    op.create_table(
+        "catalog_version",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name", name=op.f("pk_catalog_version")),
+    )
+    op.execute(
+        "INSERT INTO catalog_version (name, version, updated_at) "
+        "SELECT 'author', 0, current_timestamp "
+        "UNION ALL SELECT 'book', 0, current_timestamp"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("catalog_version")
+    op.drop_column("book", "updated_at")
+    op.drop_column("author", "updated_at")
@@ -0,0 +1,31 @@
+"""add book year and authorship indexes
+
+Revision ID: d4e7a9c2f318
+Revises: b8d3e6f1a247
+Create Date: 2026-10-18 15:02:11.472930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e7a9c2f318"
+down_revision: Union[str, Sequence[str], None] = "b8d3e6f1a247"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_book_authorship_book_id", "book_authorship", ["book_id"], unique=False
+    )
+    op.create_index("ix_book_year", "book", ["year"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_book_year", table_name="book")
+    op.drop_index("ix_book_authorship_book_id", table_name="book_authorship")
@@ -0,0 +1,36 @@
+"""add user token version
+
+Revision ID: e5a90c3f7b12
+Revises: c71e0b5d2a94
+Create Date: 2026-10-18 11:40:05.806412
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a90c3f7b12"
+down_revision: Union[str, Sequence[str], None] = "c71e0b5d2a94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "user",
+        sa.Column(
+            "token_version",
+            sa.Integer(),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("user", "token_version")
@@ -0,0 +1,34 @@
+"""add sort indexes
+
+Revision ID: f2b6c8d0e453
+Revises: d4e7a9c2f318
+Create Date: 2026-10-18 16:25:47.903114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b6c8d0e453"
+down_revision: Union[str, Sequence[str], None] = "d4e7a9c2f318"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # o índice composto também atende os filtros por faixa de ano
+    op.drop_index("ix_book_year", table_name="book")
+    op.create_index("ix_book_year_id", "book", ["year", "id"], unique=False)
+    op.create_index(
+        "ix_author_nationality_id", "author", ["nationality", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_author_nationality_id", table_name="author")
+    op.drop_index("ix_book_year_id", table_name="book")
+    op.create_index("ix_book_year", "book", ["year"], unique=False)
@@ -2,17 +2,23 @@ from contextlib import contextmanager
 from faker import Faker
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.sql import insert
 from madr.app import app
 from fastapi.testclient import TestClient
 
-from madr.core.database import get_async_session
+from madr.core.database import get_async_session, get_session_maker
+from madr.core.instrumentation import instrument_engine
 from madr.core.orm.mapping import init_mappings, mapping_registry, remove_mappings
+from madr.core.security import decoded_tokens, hash_password, user_versions
+from madr.deps import get_read_session, login_limiter
 from madr.models import Author, Book, User
+from madr.utils.caching import response_cache
 from tests.factories import AuthorCreateFactory, BookCreateFactory, UserCreateFactory
 
 engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+instrument_engine(engine)
 
 sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -29,12 +35,53 @@ async def session():
         remove_mappings()
 
 
+@pytest.fixture
+def queries():
+    """
+    Comandos SQL executados no banco enquanto a fixture está ativa
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def query_budget(queries: list[str]):
+    """
+    Falha se o bloco executar mais comandos SQL do que o orçamento informado
+    """
+
+    @contextmanager
+    def budget(max_statements: int):
+        start = len(queries)
+        yield
+        issued = queries[start:]
+        assert (
+            len(issued) <= max_statements
+        ), f"{len(issued)} comandos, orçamento de {max_statements}:\n\n" + "\n\n".join(
+            issued
+        )
+
+    return budget
+
+
 @pytest.fixture
 def client(session: AsyncSession):
     def session_override():
         return session
 
     app.dependency_overrides[get_async_session] = session_override
+    app.dependency_overrides[get_read_session] = session_override
+    app.dependency_overrides[get_session_maker] = lambda: sessionmaker
+    response_cache.clear()
+    login_limiter.clear()
+    decoded_tokens.clear()
+    user_versions.clear()
     # mapeamento imperativo é controlado na fixture session, por isso
     # client não está em um bloco with que faria o lifespan executar
     client = TestClient(app)
@@ -71,7 +118,12 @@ async def existing_user(client, session: AsyncSession) -> User:
     result = (
         await session.execute(
             insert(User)
-            .values(UserCreateFactory.create(password="password").model_dump())
+            .values(
+                {
+                    **UserCreateFactory.create().model_dump(),
+                    "password": hash_password("password"),
+                }
+            )
             .returning(User)
         )
     ).scalar_one()
@@ -85,7 +137,12 @@ async def another_user(client, session: AsyncSession) -> User:
     result = (
         await session.execute(
             insert(User)
-            .values(UserCreateFactory.create(password="password").model_dump())
+            .values(
+                {
+                    **UserCreateFactory.create().model_dump(),
+                    "password": hash_password("password"),
+                }
+            )
             .returning(User)
         )
     ).scalar_one()
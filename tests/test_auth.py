@@ -1,13 +1,25 @@
 from datetime import datetime, timedelta
 from http import HTTPStatus
+from uuid import UUID
 from fastapi.testclient import TestClient
 import re
 from freezegun import freeze_time
+from pwdlib import PasswordHash
+from pydantic import ValidationError
+from pwdlib.hashers.argon2 import Argon2Hasher
 import pytest
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from madr.core.settings import settings
+from madr.app import app
+from madr.core.database import get_async_session
+
+from madr.core import hashing
+from madr.core.hashing import verify_password_hash_async
+from madr.core.security import decoded_tokens, pwd_context, user_versions
+from madr.core.settings import Settings, settings
+from madr.deps import login_limiter
 from madr.models import User
+from madr.utils.rate_limit import TokenBucketLimiter
 from .factories import UserCreateFactory
 
 
@@ -21,6 +33,26 @@ def test_user_can_create_account_with_valid_email_and_password(client: TestClien
     assert user_name.replace(" ", "").isalpha()
 
 
+@pytest.mark.asyncio
+async def test_user_password_is_stored_hashed(
+    client: TestClient, session: AsyncSession
+):
+    user = UserCreateFactory.create()
+
+    response = client.post("/conta", json=user.model_dump(mode="python"))
+    stored_user = await session.get(User, UUID(response.json()["id"]))
+
+    assert stored_user.password != user.password
+    assert (await verify_password_hash_async(user.password, stored_user.password))[0]
+
+
+def test_user_can_not_create_account_with_short_password(client: TestClient):
+    user = UserCreateFactory.create().model_dump(mode="python")
+
+    response = client.post("/conta", json={**user, "password": "short"})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 def test_user_can_not_create_account_with_existing_email(
     client: TestClient, existing_user: User
 ):
@@ -39,6 +71,54 @@ def test_user_can_get_token_with_valid_email_and_password(
     assert response.status_code == HTTPStatus.OK
 
 
+@pytest.mark.asyncio
+async def test_login_rehashes_password_with_outdated_parameters(
+    client: TestClient, existing_user: User, session: AsyncSession
+):
+    outdated_hasher = PasswordHash((Argon2Hasher(time_cost=1, memory_cost=8192),))
+    existing_user.password = outdated_hasher.hash(
+        "password" + settings.PASSWORD_PEPPER.get_secret_value()
+    )
+    await session.commit()
+
+    response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    # descarta o que não foi commitado pela rota
+    await session.rollback()
+    stored_user = await session.get(User, existing_user.id)
+
+    assert not pwd_context.hashers[0].check_needs_rehash(stored_user.password)
+
+
+@pytest.mark.asyncio
+async def test_login_rehash_works_with_sessions_that_expire_on_commit(
+    client: TestClient, existing_user: User, session: AsyncSession
+):
+    outdated_hasher = PasswordHash((Argon2Hasher(time_cost=1, memory_cost=8192),))
+    existing_user.password = outdated_hasher.hash(
+        "password" + settings.PASSWORD_PEPPER.get_secret_value()
+    )
+    await session.commit()
+
+    # o sessionmaker de produção mantém o expire_on_commit padrão
+    expiring_sessionmaker = async_sessionmaker(session.bind)
+
+    async def session_override():
+        async with expiring_sessionmaker() as expiring_session:
+            yield expiring_session
+
+    app.dependency_overrides[get_async_session] = session_override
+
+    response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["access_token"]
+
+
 def test_user_cannot_get_token_with_not_existing_email(client: TestClient):
     response = client.post(
         "/token", data={"username": "notvalid@mail.com", "password": "mypassword"}
@@ -55,6 +135,48 @@ def test_user_cannot_get_token_with_invalid_password(
     assert response.status_code == HTTPStatus.BAD_REQUEST
 
 
+def test_login_is_rate_limited_per_client(
+    client: TestClient, existing_user: User, monkeypatch
+):
+    monkeypatch.setattr(login_limiter, "capacity", 2)
+
+    for _ in range(2):
+        response = client.post(
+            "/token", data={"username": existing_user.email, "password": "invalid"}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    limited_response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+
+    assert limited_response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(limited_response.headers["Retry-After"]) > 0
+
+
+def test_login_rate_limit_requires_a_positive_refill_rate():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(capacity=1, refill_rate=0, max_clients=1)
+
+    with pytest.raises(ValidationError):
+        Settings(LOGIN_RATE_LIMIT_PER_MINUTE=0)
+
+
+def test_login_fails_fast_when_hashing_is_saturated(
+    client: TestClient, existing_user: User, monkeypatch
+):
+    monkeypatch.setattr(
+        hashing, "hashing_queue", hashing.HashingQueue(concurrency=0, max_waiting=0)
+    )
+
+    response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == str(settings.PASSWORD_HASHING_RETRY_AFTER)
+
+
 def test_user_can_use_non_expired_token(client: TestClient, existing_user: User):
     token_response = client.post(
         "/token", data={"username": existing_user.email, "password": "password"}
@@ -69,6 +191,24 @@ def test_user_can_use_non_expired_token(client: TestClient, existing_user: User)
     assert info_response.status_code == HTTPStatus.OK
 
 
+def test_account_info_returns_not_modified_for_matching_etag(
+    client: TestClient, existing_user: User
+):
+    token_response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+
+    info_response = client.get("/conta/minha-conta", headers=headers)
+    not_modified_response = client.get(
+        "/conta/minha-conta",
+        headers={**headers, "If-None-Match": info_response.headers["ETag"]},
+    )
+
+    assert not_modified_response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not_modified_response.content == b""
+
+
 def test_user_cannot_use_expired_token(client: TestClient, existing_user: User):
     now = datetime.now()
     with freeze_time(now):
@@ -159,6 +299,45 @@ def test_user_can_update_its_own_information(client: TestClient, existing_user:
     assert update_response.status_code == HTTPStatus.OK
 
 
+def test_user_tokens_are_revoked_after_account_update(
+    client: TestClient, existing_user: User
+):
+    token_response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+    assert client.post("/refresh-token", headers=headers).status_code == HTTPStatus.OK
+
+    client.put(
+        f"/conta/{existing_user.id}",
+        headers=headers,
+        json=UserCreateFactory.create().model_dump(mode="python"),
+    )
+
+    refresh_response = client.post("/refresh-token", headers=headers)
+    info_response = client.get("/conta/minha-conta", headers=headers)
+
+    assert refresh_response.status_code == HTTPStatus.UNAUTHORIZED
+    assert info_response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_authenticated_requests_reuse_cached_token_version(
+    client: TestClient, existing_user: User
+):
+    token_response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+
+    for _ in range(2):
+        assert (
+            client.post("/refresh-token", headers=headers).status_code == HTTPStatus.OK
+        )
+
+    assert user_versions.stats()["hits"] == 1
+    assert decoded_tokens.stats()["hits"] == 1
+
+
 def test_user_cannot_update_to_already_existing_email(
     client: TestClient, existing_user: User, another_user: User
 ):
@@ -209,6 +388,19 @@ def test_user_can_delete_its_own_account(client: TestClient, existing_user: User
     assert delete_response.status_code == HTTPStatus.OK
 
 
+def test_deleted_user_token_is_rejected(client: TestClient, existing_user: User):
+    token_response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+    assert client.post("/refresh-token", headers=headers).status_code == HTTPStatus.OK
+
+    client.delete(f"/conta/{existing_user.id}", headers=headers)
+
+    refresh_response = client.post("/refresh-token", headers=headers)
+    assert refresh_response.status_code == HTTPStatus.UNAUTHORIZED
+
+
 def test_user_cannot_delete_another_user_account(
     client: TestClient, existing_user: User, another_user
 ):
@@ -1,10 +1,14 @@
+import json
+
 from faker import Faker
 from fastapi.testclient import TestClient
 from pydantic import ValidationError
 import pytest
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.models import Author
+from madr.core.orm.mapping import book_authorship_table
+from madr.models import Author, Book
 from madr.schema import AuthorSchema
 from tests.conftest import does_not_raise, get_random_substring
 from tests.factories import AuthorCreateFactory
@@ -26,6 +30,22 @@ def test_get_author_with_invalid_id_fails(existing_author: Author, client: TestC
     assert response.status_code == 404
 
 
+def test_conditional_get_of_unexisting_author_is_not_found(
+    token: str, existing_author: Author, client: TestClient
+):
+    client.patch(
+        f"{base_url}/{existing_author.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json=AuthorCreateFactory.create().model_dump(mode="json"),
+    )
+
+    response = client.get(
+        f"{base_url}/{existing_author.id + 1}", headers={"If-None-Match": "*"}
+    )
+
+    assert response.status_code == 404
+
+
 filters = [
     (lambda x: "", lambda response: len(response) == 1),
     (lambda x: x, lambda response: len(response) == 1),
@@ -46,6 +66,18 @@ def test_list_authors_can_filter_name_partially(
     assert expected_result(response.json())
 
 
+@pytest.mark.parametrize("used_filter,expected_result", filters)
+def test_list_authors_can_search_name(
+    used_filter, expected_result, existing_author: Author, client: TestClient
+):
+    response = client.get(
+        f"{base_url}", params={"busca": used_filter(existing_author.name)}
+    )
+
+    assert response.status_code == 200
+    assert expected_result(response.json())
+
+
 @pytest.mark.asyncio
 async def test_list_authors_paginates_exceeding_results(
     session: AsyncSession, client: TestClient, page_size=20
@@ -62,6 +94,61 @@ async def test_list_authors_paginates_exceeding_results(
     assert len(second_page_response.json()) == 1
 
 
+@pytest.mark.asyncio
+async def test_list_authors_sorts_by_nationality_with_id_tiebreak(
+    session: AsyncSession, client: TestClient
+):
+    instances = [
+        Author(**AuthorCreateFactory.create(nationality=nationality).model_dump())
+        for nationality in ["italiana", "brasileira", "italiana", "angolana"]
+    ]
+    session.add_all(instances)
+    await session.commit()
+
+    first_page = client.get(base_url, params={"ordenar": "-nacionalidade", "limite": 3})
+    second_page = client.get(
+        base_url,
+        params={
+            "ordenar": "-nacionalidade",
+            "cursor": first_page.headers["X-Next-Cursor"],
+        },
+    )
+
+    assert [author["id"] for author in first_page.json() + second_page.json()] == [
+        instances[0].id,
+        instances[2].id,
+        instances[1].id,
+        instances[3].id,
+    ]
+
+
+def test_list_authors_rejects_unindexed_sort(client: TestClient):
+    response = client.get(base_url, params={"ordenar": "data-nascimento"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_authors_paginates_with_cursor(
+    session: AsyncSession, client: TestClient, page_size=20
+):
+    to_create = AuthorCreateFactory.create_batch(page_size + 1)
+    instances = [Author(**create.model_dump()) for create in to_create]
+    session.add_all(instances)
+    await session.commit()
+
+    first_page_response = client.get(f"{base_url}")
+    assert len(first_page_response.json()) == page_size
+
+    second_page_response = client.get(
+        f"{base_url}",
+        params={"cursor": first_page_response.headers["X-Next-Cursor"]},
+    )
+    assert [author["id"] for author in second_page_response.json()] == [
+        instances[-1].id
+    ]
+
+
 def test_list_authors_returns_empty_without_authors(client: TestClient):
     response = client.get(f"{base_url}")
 
@@ -69,6 +156,100 @@ def test_list_authors_returns_empty_without_authors(client: TestClient):
     assert len(response.json()) == 0
 
 
+def test_list_authors_by_ids(
+    existing_author: Author, another_author: Author, client: TestClient
+):
+    response = client.get(
+        base_url, params={"ids": [another_author.id, existing_author.id, 999]}
+    )
+
+    assert [author["id"] for author in response.json()] == [
+        another_author.id,
+        existing_author.id,
+    ]
+    assert response.headers["X-Missing-Ids"] == "999"
+
+
+def test_export_authors_streams_ndjson(
+    existing_author: Author, another_author: Author, client: TestClient
+):
+    response = client.get(f"{base_url}/export")
+
+    assert response.status_code == 200
+    assert [json.loads(line)["nome"] for line in response.text.splitlines()] == [
+        existing_author.name,
+        another_author.name,
+    ]
+
+
+def test_export_authors_rejects_unknown_format(client: TestClient):
+    response = client.get(f"{base_url}/export", params={"formato": "xml"})
+
+    assert response.status_code == 422
+
+
+def test_import_authors_skips_existing_names(
+    existing_author: Author, token: str, client: TestClient
+):
+    content = (
+        "nome,nacionalidade,data-nascimento\n"
+        f"{existing_author.name},brasileira,1900-01-01\n"
+        "clarice lispector,brasileira,1920-12-10\n"
+        "sem data,brasileira,\n"
+    )
+
+    response = client.post(
+        f"{base_url}/importacao",
+        params={"formato": "csv"},
+        files={"arquivo": ("romancistas.csv", content)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inseridos"] == 1
+    assert [conflict["linha"] for conflict in response.json()["conflitos"]] == [2, 4]
+    assert len(client.get(base_url).json()) == 2
+
+
+def test_list_authors_etag_reflects_updates_and_deletes(
+    token: str, existing_author: Author, client: TestClient
+):
+    client.patch(
+        f"{base_url}/{existing_author.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json=AuthorCreateFactory.create().model_dump(mode="json"),
+    )
+    etag = client.get(f"{base_url}").headers["ETag"]
+
+    not_modified_response = client.get(f"{base_url}", headers={"If-None-Match": etag})
+    assert not_modified_response.status_code == 304
+
+    client.delete(
+        f"{base_url}/{existing_author.id}", headers={"Authorization": f"Bearer {token}"}
+    )
+    modified_response = client.get(f"{base_url}", headers={"If-None-Match": etag})
+    assert modified_response.status_code == 200
+
+
+def test_get_author_honours_if_modified_since(
+    token: str, existing_author: Author, client: TestClient
+):
+    client.patch(
+        f"{base_url}/{existing_author.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json=AuthorCreateFactory.create().model_dump(mode="json"),
+    )
+    response = client.get(f"{base_url}/{existing_author.id}")
+    assert response.headers["Vary"] == "Accept-Language"
+
+    not_modified_response = client.get(
+        f"{base_url}/{existing_author.id}",
+        headers={"If-Modified-Since": response.headers["Last-Modified"]},
+    )
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.content == b""
+
+
 def test_authenticated_user_can_insert_author(token: str, client: TestClient):
     response = client.post(
         f"{base_url}",
@@ -176,3 +357,91 @@ def test_authenticated_user_can_not_delete_unexisting_author(
     )
 
     assert response.status_code == 404
+
+
+def test_update_authors_in_batch(
+    existing_author: Author,
+    another_author: Author,
+    token: str,
+    client: TestClient,
+):
+    response = client.patch(
+        f"{base_url}/lote?ids={existing_author.id},{another_author.id}",
+        json={"nacionalidade": "brasileira"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"afetados": 2, "falhas": []}
+    assert {author["nacionalidade"] for author in client.get(base_url).json()} == {
+        "brasileira"
+    }
+
+
+def test_update_authors_in_batch_requires_changes(
+    existing_author: Author, token: str, client: TestClient
+):
+    response = client.patch(
+        f"{base_url}/lote?ids={existing_author.id}",
+        json={},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("method", ["PATCH", "DELETE"])
+@pytest.mark.parametrize("search", [" ", "42", "!!!"])
+def test_authors_batch_requires_a_search_term_that_filters(
+    method: str,
+    search: str,
+    existing_author: Author,
+    token: str,
+    client: TestClient,
+):
+    # a sanitização esvazia esses termos, que selecionariam todos os romancistas
+    response = client.request(
+        method,
+        f"{base_url}/lote",
+        params={"busca": search},
+        json={"nacionalidade": "outra"} if method == "PATCH" else None,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+    assert client.get(base_url).json()[0]["nacionalidade"] == (
+        existing_author.nationality
+    )
+
+
+@pytest.mark.asyncio
+async def test_delete_authors_in_batch_keeps_authors_with_books(
+    session: AsyncSession,
+    existing_author: Author,
+    another_author: Author,
+    existing_book: Book,
+    token: str,
+    client: TestClient,
+):
+    await session.execute(
+        insert(book_authorship_table).values(
+            book_id=existing_book.id, author_id=existing_author.id
+        )
+    )
+    await session.commit()
+    missing_id = another_author.id + 1
+
+    response = client.delete(
+        f"{base_url}/lote?ids={existing_author.id},{another_author.id},{missing_id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["afetados"] == 1
+    assert [failure["id"] for failure in response.json()["falhas"]] == [
+        existing_author.id,
+        missing_id,
+    ]
+    assert [author["id"] for author in client.get(base_url).json()] == [
+        existing_author.id
+    ]
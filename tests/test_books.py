@@ -1,11 +1,18 @@
+import csv
+import io
+import json
 from typing import Callable
 from fastapi.testclient import TestClient
 from pydantic import ValidationError
 import pytest
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.models import Book
+from madr.core.orm.mapping import book_authorship_table
+from madr.core.settings import settings
+from madr.models import Author, Book
 from madr.schema import BookSchema
+from madr.utils.pagination import encode_cursor
 from tests.conftest import does_not_raise, get_random_substring
 from tests.factories import BookCreateFactory
 
@@ -68,6 +75,32 @@ def test_list_books_can_apply_filter(
     assert expected_result(response.json())
 
 
+@pytest.mark.asyncio
+async def test_list_books_search_ranks_closest_name_first(
+    session: AsyncSession, client: TestClient
+):
+    instances = [
+        Book(**BookCreateFactory.create(name=name).model_dump(exclude={"author_ids"}))
+        for name in ["Dom Casmurro e outros contos", "Dom Casmurro", "Memorial"]
+    ]
+    session.add_all(instances)
+    await session.commit()
+
+    response = client.get("/livro", params={"busca": "casmurro dom"})
+
+    assert response.status_code == 200
+    assert [book["nome"] for book in response.json()] == [
+        "dom casmurro",
+        "dom casmurro e outros contos",
+    ]
+
+
+def test_list_books_rejects_cursor_on_search(client: TestClient):
+    response = client.get("/livro", params={"busca": "dom", "cursor": "WzFd"})
+
+    assert response.status_code == 400
+
+
 def test_list_books_returns_empty_without_books(client: TestClient):
     response = client.get("/livro")
 
@@ -93,6 +126,169 @@ async def test_list_books_paginates_exceeding_results(
     assert len(second_page_response.json()) == 1
 
 
+@pytest.mark.asyncio
+async def test_list_books_paginates_with_cursor(
+    session: AsyncSession, client: TestClient, page_size=20
+):
+    to_create = BookCreateFactory.create_batch(page_size + 1)
+    instances = [
+        Book(**create.model_dump(exclude={"author_ids"})) for create in to_create
+    ]
+    session.add_all(instances)
+    await session.commit()
+
+    first_page_response = client.get("/livro")
+    assert len(first_page_response.json()) == page_size
+    assert "X-Next-Cursor" in first_page_response.headers
+
+    second_page_response = client.get(
+        "/livro", params={"cursor": first_page_response.headers["X-Next-Cursor"]}
+    )
+    assert [book["id"] for book in second_page_response.json()] == [instances[-1].id]
+    assert "X-Next-Cursor" not in second_page_response.headers
+
+
+@pytest.mark.asyncio
+async def test_list_books_sorts_with_mixed_directions_across_cursor_pages(
+    session: AsyncSession, client: TestClient
+):
+    instances = [
+        Book(**BookCreateFactory.create(year=year).model_dump(exclude={"author_ids"}))
+        for year in [2000, 1999, 2000, 2001, 2000]
+    ]
+    session.add_all(instances)
+    await session.commit()
+
+    ids = []
+    params = {"ordenar": "ano,-nome", "limite": 2}
+    while True:
+        response = client.get("/livro", params=params)
+        assert response.status_code == 200
+        ids.extend(book["id"] for book in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    expected = sorted(instances, key=lambda book: book.name, reverse=True)
+    expected.sort(key=lambda book: book.year)
+    assert ids == [book.id for book in expected]
+
+
+@pytest.mark.parametrize("sort_by", ["isbn", "ano,ano", "-"])
+def test_list_books_rejects_unindexed_sort(sort_by: str, client: TestClient):
+    response = client.get("/livro", params={"ordenar": sort_by})
+
+    assert response.status_code == 400
+
+
+def test_list_books_rejects_cursor_from_another_sort(
+    existing_book: Book, another_book: Book, client: TestClient
+):
+    cursor = client.get("/livro", params={"ordenar": "nome", "limite": 1}).headers[
+        "X-Next-Cursor"
+    ]
+
+    response = client.get("/livro", params={"ordenar": "ano", "cursor": cursor})
+
+    assert response.status_code == 400
+
+
+def test_list_books_rejects_invalid_cursor(client: TestClient):
+    response = client.get("/livro", params={"cursor": "invalido"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("value", [True, 10**30])
+def test_list_books_rejects_cursor_values_outside_the_column_type(
+    value: bool | int, client: TestClient
+):
+    response = client.get("/livro", params={"cursor": encode_cursor([value])})
+
+    assert response.status_code == 400
+
+
+def test_list_books_by_ids_keeps_request_order(
+    existing_book: Book, another_book: Book, client: TestClient, queries: list[str]
+):
+    response = client.get(
+        "/livro", params={"ids": f"{another_book.id},999,{existing_book.id}"}
+    )
+
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == [
+        another_book.id,
+        existing_book.id,
+    ]
+    assert response.headers["X-Missing-Ids"] == "999"
+    assert len([query for query in queries if "FROM book " in query]) == 1
+
+
+def test_get_many_books_by_body(
+    existing_book: Book, another_book: Book, client: TestClient
+):
+    response = client.post(
+        "/livro/ids", json={"ids": [existing_book.id, another_book.id]}
+    )
+
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == [
+        existing_book.id,
+        another_book.id,
+    ]
+    assert "X-Missing-Ids" not in response.headers
+
+
+def test_get_many_books_rejects_too_many_ids(client: TestClient):
+    response = client.post(
+        "/livro/ids", json={"ids": list(range(settings.MAX_BATCH_IDS + 1))}
+    )
+
+    assert response.status_code == 422
+
+
+def test_list_books_rejects_page_above_maximum(client: TestClient):
+    response = client.get("/livro", params={"limite": settings.MAX_PAGE_SIZE + 1})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_books_streams_ndjson_in_batches(
+    session: AsyncSession, client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    instances = [
+        Book(**create.model_dump(exclude={"author_ids"}))
+        for create in BookCreateFactory.create_batch(5)
+    ]
+    session.add_all(instances)
+    await session.commit()
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+
+    response = client.get("/livro/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [instance.id for instance in instances]
+    assert lines[0]["nome"] == instances[0].name
+
+
+def test_export_books_as_csv_honours_filters(
+    existing_book: Book, another_book: Book, client: TestClient
+):
+    response = client.get(
+        "/livro/export", params={"formato": "csv", "nome": another_book.name}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["isbn", "nome", "ano", "id", "authors_names"]
+    # o nome do livro criado depois nunca está contido no do anterior
+    assert [row[1] for row in rows[1:]] == [another_book.name]
+
+
 def test_authenticated_user_can_create_book(token: str, client: TestClient):
     response = client.post(
         "/livro",
@@ -105,6 +301,317 @@ def test_authenticated_user_can_create_book(token: str, client: TestClient):
         BookSchema.model_validate(response.json())
 
 
+def test_list_books_is_cached_until_next_write(token: str, client: TestClient):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/livro", headers=headers, json=BookCreateFactory().model_dump())
+
+    first_response = client.get("/livro")
+    second_response = client.get("/livro")
+    assert second_response.content == first_response.content
+    assert client.get("/status/cache").json()["hits"] == 1
+
+    client.post("/livro", headers=headers, json=BookCreateFactory().model_dump())
+
+    assert len(client.get("/livro").json()) == 2
+
+
+def test_import_books_reports_conflicts_per_line(
+    existing_book: Book, existing_author: Author, token: str, client: TestClient
+):
+    content = "\n".join(
+        [
+            json.dumps(
+                {
+                    "isbn": "9780306406157",
+                    "nome": "memorias postumas",
+                    "ano": 1881,
+                    "ids_romancistas": [existing_author.id],
+                }
+            ),
+            json.dumps({"isbn": "9780306406157", "nome": existing_book.name, "ano": 1}),
+            json.dumps(
+                {"isbn": "9780306406157", "nome": "memorias postumas", "ano": 1}
+            ),
+            json.dumps(
+                {"isbn": "9780306406157", "nome": "outro", "ids_romancistas": [999]}
+            ),
+            json.dumps(
+                {
+                    "isbn": "9780306406157",
+                    "nome": "quincas borba",
+                    "ano": 1891,
+                    "ids_romancistas": [999],
+                }
+            ),
+        ]
+    )
+
+    response = client.post(
+        "/livro/importacao",
+        files={"arquivo": ("livros.ndjson", content)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "finished"
+    assert job["total"] == job["processados"] == 5
+    assert job["inseridos"] == 1
+    assert [conflict["linha"] for conflict in job["conflitos"]] == [2, 3, 4, 5]
+
+    books = client.get("/livro", params={"nome": "memorias"}).json()
+    assert [book["authors_names"] for book in books] == [[existing_author.name]]
+
+
+def test_import_books_ignores_repeated_author_ids(
+    existing_author: Author, token: str, client: TestClient
+):
+    content = json.dumps(
+        {
+            "isbn": "9780306406157",
+            "nome": "dom casmurro",
+            "ano": 1899,
+            "ids_romancistas": [existing_author.id, existing_author.id],
+        }
+    )
+
+    response = client.post(
+        "/livro/importacao",
+        files={"arquivo": ("livros.ndjson", content)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inseridos"] == 1
+    books = client.get("/livro").json()
+    assert [book["authors_names"] for book in books] == [[existing_author.name]]
+
+
+def test_import_books_from_csv_in_background(
+    token: str, client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "IMPORT_SYNC_MAX_ROWS", 0)
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 1)
+    content = (
+        "isbn,nome,ano,ids_romancistas\n"
+        "9780306406157,dom casmurro,1899,\n"
+        "9780140449136,esau e jaco,1904,\n"
+    )
+
+    response = client.post(
+        "/livro/importacao",
+        params={"formato": "csv"},
+        files={"arquivo": ("livros.csv", content)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 202
+    # o arquivo só é lido depois da resposta
+    assert response.json()["status"] == "pending"
+    assert response.json()["total"] is None
+    progress = client.get(
+        response.headers["Location"], headers={"Authorization": f"Bearer {token}"}
+    ).json()
+    assert progress["status"] == "finished"
+    assert progress["inseridos"] == 2
+    assert len(client.get("/livro").json()) == 2
+
+
+def test_import_books_rejects_invalid_encoding(token: str, client: TestClient):
+    response = client.post(
+        "/livro/importacao",
+        files={"arquivo": ("livros.ndjson", "nome".encode("utf-16"))},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+
+
+def test_import_books_in_background_records_invalid_files_as_failed(
+    token: str, client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "IMPORT_SYNC_MAX_ROWS", 0)
+
+    response = client.post(
+        "/livro/importacao",
+        files={"arquivo": ("livros.ndjson", "nome".encode("utf-16"))},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 202
+    progress = client.get(
+        response.headers["Location"], headers={"Authorization": f"Bearer {token}"}
+    ).json()
+    assert progress["status"] == "failed"
+    assert [conflict["linha"] for conflict in progress["conflitos"]] == [0]
+
+
+def book_statements(queries: list[str]) -> list[str]:
+    # a versão do catálogo e a do token não fazem parte da escrita
+    return [
+        query
+        for query in queries
+        if "catalog_version" not in query and "token_version" not in query
+    ]
+
+
+def test_create_book_with_authors_in_two_statements(
+    existing_author: Author,
+    another_author: Author,
+    token: str,
+    client: TestClient,
+    queries: list[str],
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    queries.clear()
+
+    response = client.post(
+        "/livro",
+        json={
+            **BookCreateFactory.create().model_dump(by_alias=True),
+            "ids_romancistas": [another_author.id, existing_author.id],
+        },
+        headers=headers,
+    )
+
+    assert response.status_code == 201
+    assert response.json()["authors_names"] == [
+        existing_author.name,
+        another_author.name,
+    ]
+    assert len(book_statements(queries)) == 2
+
+
+def test_create_book_with_missing_author_persists_nothing(
+    existing_author: Author, token: str, client: TestClient
+):
+    response = client.post(
+        "/livro",
+        json={
+            **BookCreateFactory.create().model_dump(by_alias=True),
+            "ids_romancistas": [existing_author.id, 999],
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 404
+    assert client.get("/livro").json() == []
+
+
+@pytest.mark.asyncio
+async def test_update_book_authors_changes_only_the_difference(
+    session: AsyncSession,
+    existing_book: Book,
+    existing_author: Author,
+    another_author: Author,
+    token: str,
+    client: TestClient,
+    queries: list[str],
+):
+    await session.execute(
+        insert(book_authorship_table).values(
+            book_id=existing_book.id, author_id=existing_author.id
+        )
+    )
+    await session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+    queries.clear()
+
+    response = client.patch(
+        f"/livro/{existing_book.id}",
+        json={"ids_romancistas": [existing_author.id, another_author.id]},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert response.json()["authors_names"] == [
+        existing_author.name,
+        another_author.name,
+    ]
+    assert len(book_statements(queries)) == 3
+    assert not any(
+        "DELETE FROM book_authorship" in query and "book.id" in query
+        for query in queries
+    )
+
+
+def test_update_book_fields_keeps_authors_in_two_statements(
+    existing_book: Book,
+    token: str,
+    client: TestClient,
+    queries: list[str],
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    queries.clear()
+
+    response = client.patch(
+        f"/livro/{existing_book.id}", json={"ano": 1900}, headers=headers
+    )
+
+    assert response.status_code == 200
+    assert response.json()["ano"] == 1900
+    assert response.json()["authors_names"] == []
+    assert len(book_statements(queries)) == 2
+
+
+def test_upsert_book_by_isbn_is_idempotent(
+    existing_author: Author, token: str, client: TestClient, queries: list[str]
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {
+        "nome": "dom casmurro",
+        "ano": 1899,
+        "ids_romancistas": [existing_author.id],
+    }
+
+    # ISBN-10 é normalizado para ISBN-13
+    created = client.put("/livro/isbn/0306406152", json=body, headers=headers)
+    assert created.status_code == 201
+    assert created.json()["isbn"] == "9780306406157"
+    assert created.json()["authors_names"] == [existing_author.name]
+    etag = client.get("/livro").headers["ETag"]
+
+    queries.clear()
+    resent = client.put("/livro/isbn/9780306406157", json=body, headers=headers)
+    assert resent.status_code == 200
+    assert resent.json() == created.json()
+    assert not any("catalog_version" in query for query in queries)
+    assert client.get("/livro").headers["ETag"] == etag
+
+    updated = client.put(
+        "/livro/isbn/9780306406157", json={**body, "ano": 1900}, headers=headers
+    )
+    assert updated.status_code == 200
+    assert updated.json()["id"] == created.json()["id"]
+    assert updated.json()["ano"] == 1900
+    assert updated.json()["authors_names"] == [existing_author.name]
+    assert client.get("/livro").headers["ETag"] != etag
+
+
+def test_get_book_by_isbn(existing_book: Book, client: TestClient):
+    response = client.get(f"/livro/isbn/{existing_book.isbn}")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == existing_book.id
+
+
+def test_get_book_by_unknown_isbn_fails(client: TestClient):
+    assert client.get("/livro/isbn/9780140449136").status_code == 404
+    assert client.get("/livro/isbn/123").status_code == 422
+
+
+def test_upsert_book_by_isbn_with_used_name_fails(
+    existing_book: Book, token: str, client: TestClient
+):
+    response = client.put(
+        "/livro/isbn/9780140449136",
+        json={"nome": existing_book.name, "ano": 1900},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 409
+
+
 def test_authenticated_user_can_not_create_book_with_used_name(
     token: str, existing_book: Book, client: TestClient
 ):
@@ -186,6 +693,59 @@ async def test_authenticated_user_can_delete_existing_book(
     assert (await session.get(Book, existing_book.id)) is None
 
 
+def test_list_books_is_modified_after_delete(
+    token: str, existing_book: Book, client: TestClient
+):
+    client.patch(
+        f"/livro/{existing_book.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"ano": existing_book.year + 1},
+    )
+    etag = client.get("/livro").headers["ETag"]
+
+    client.delete(
+        f"/livro/{existing_book.id}", headers={"Authorization": f"Bearer {token}"}
+    )
+    response = client.get("/livro", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 0
+
+
+def test_get_book_returns_not_modified_for_matching_etag(
+    token: str, existing_book: Book, client: TestClient
+):
+    client.patch(
+        f"/livro/{existing_book.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"ano": existing_book.year + 1},
+    )
+    etag = client.get(f"/livro/{existing_book.id}").headers["ETag"]
+
+    response = client.get(
+        f"/livro/{existing_book.id}", headers={"If-None-Match": f'"other", {etag}'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_conditional_get_of_unexisting_book_is_not_found(
+    token: str, existing_book: Book, client: TestClient
+):
+    client.patch(
+        f"/livro/{existing_book.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"ano": existing_book.year + 1},
+    )
+
+    by_id = client.get(f"/livro/{existing_book.id + 1}", headers={"If-None-Match": "*"})
+    by_isbn = client.get("/livro/isbn/9780140449136", headers={"If-None-Match": "*"})
+
+    assert by_id.status_code == 404
+    assert by_isbn.status_code == 404
+
+
 def test_authenticated_user_can_not_delete_unexisting_book(
     token: str, client: TestClient
 ):
@@ -205,3 +765,81 @@ async def test_unauthenticated_user_can_not_delete_existing_book(
     assert delete_response.status_code == 401
 
     assert (await session.get(Book, existing_book.id)) is not None
+
+
+def test_update_books_in_batch_reports_missing_ids(
+    existing_book: Book,
+    another_book: Book,
+    token: str,
+    client: TestClient,
+    queries: list[str],
+):
+    missing_id = another_book.id + 1
+    queries.clear()
+
+    response = client.patch(
+        f"/livro/lote?ids={existing_book.id},{another_book.id},{missing_id}",
+        json={"ano": 1900},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["afetados"] == 2
+    assert [failure["id"] for failure in response.json()["falhas"]] == [missing_id]
+    assert len(book_statements(queries)) == 1
+    assert {book["ano"] for book in client.get("/livro").json()} == {1900}
+
+
+def test_update_books_in_batch_requires_a_selection(token: str, client: TestClient):
+    response = client.patch(
+        "/livro/lote",
+        json={"ano": 1900},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("method", ["PATCH", "DELETE"])
+@pytest.mark.parametrize("search", [" ", "1984", "!!!"])
+def test_books_batch_requires_a_search_term_that_filters(
+    method: str, search: str, existing_book: Book, token: str, client: TestClient
+):
+    # a sanitização esvazia esses termos, que selecionariam todos os livros
+    response = client.request(
+        method,
+        "/livro/lote",
+        params={"busca": search},
+        json={"ano": 1900} if method == "PATCH" else None,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 400
+    assert client.get("/livro").json()[0]["ano"] == existing_book.year
+
+
+@pytest.mark.asyncio
+async def test_delete_books_in_batch_by_filter_removes_authorships(
+    session: AsyncSession,
+    existing_book: Book,
+    another_book: Book,
+    existing_author: Author,
+    token: str,
+    client: TestClient,
+):
+    await session.execute(
+        insert(book_authorship_table).values(
+            book_id=another_book.id, author_id=existing_author.id
+        )
+    )
+    await session.commit()
+
+    response = client.delete(
+        f"/livro/lote?nome={another_book.name}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"afetados": 1, "falhas": []}
+    assert [book["id"] for book in client.get("/livro").json()] == [existing_book.id]
+    assert (await session.execute(select(book_authorship_table))).all() == []
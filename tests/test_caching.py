@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from freezegun import freeze_time
+
+from madr.utils.caching import (
+    CachedResponse,
+    ResponseCache,
+    format_http_date,
+    is_not_modified,
+    make_weak_etag,
+    parse_http_date,
+)
+
+last_modified = datetime(2025, 8, 17, 17, 25, 33, 515541, tzinfo=ZoneInfo("UTC"))
+
+
+def test_http_date_round_trips_with_second_precision():
+    formatted = format_http_date(last_modified)
+
+    assert formatted == "Sun, 17 Aug 2025 17:25:33 GMT"
+    assert parse_http_date(formatted) == last_modified.replace(microsecond=0)
+
+
+def test_parse_http_date_ignores_invalid_dates():
+    assert parse_http_date("2025-08-17T17:25:33") is None
+
+
+def test_is_not_modified_compares_etags_weakly():
+    etag = make_weak_etag("book", 1)
+
+    assert is_not_modified({"if-none-match": etag.removeprefix("W/")}, etag, None)
+    assert is_not_modified({"if-none-match": "*"}, etag, None)
+    assert not is_not_modified({"if-none-match": '"other"'}, etag, None)
+
+
+def test_is_not_modified_prefers_if_none_match_over_if_modified_since():
+    headers = {
+        "if-none-match": '"other"',
+        "if-modified-since": format_http_date(last_modified + timedelta(days=1)),
+    }
+
+    assert not is_not_modified(headers, make_weak_etag("book", 1), last_modified)
+
+
+def test_is_not_modified_honours_if_modified_since():
+    headers = {"if-modified-since": format_http_date(last_modified)}
+
+    assert is_not_modified(headers, None, last_modified)
+    assert not is_not_modified(headers, None, last_modified + timedelta(seconds=1))
+
+
+def test_response_cache_evicts_least_recently_used_entries():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set(("book", 1), CachedResponse(b"[1]", {}))
+    cache.set(("book", 2), CachedResponse(b"[2]", {}))
+    cache.get(("book", 1))
+    cache.set(("book", 3), CachedResponse(b"[3]", {}))
+
+    assert cache.get(("book", 2)) is None
+    assert cache.get(("book", 1)).body == b"[1]"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_response_cache_expires_entries():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    now = datetime.now()
+
+    with freeze_time(now):
+        cache.set(("book", 1), CachedResponse(b"[1]", {}))
+
+    with freeze_time(now + timedelta(seconds=61)):
+        assert cache.get(("book", 1)) is None
+
+
+def test_response_cache_invalidates_only_given_catalogs():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set(("book", 1), CachedResponse(b"[1]", {}))
+    cache.set(("author", 1), CachedResponse(b"[1]", {}))
+
+    cache.invalidate("book")
+
+    assert cache.get(("book", 1)) is None
+    assert cache.get(("author", 1)) is not None
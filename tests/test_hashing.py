@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from madr.core import calibration
+from madr.core.calibration import Argon2Parameters
+from madr.core.hashing import HashingQueue, HashingSaturatedError
+
+
+@pytest.mark.asyncio
+async def test_hashing_queue_rejects_work_beyond_queue_depth():
+    queue = HashingQueue(concurrency=1, max_waiting=1)
+    release = asyncio.Event()
+
+    async def hold_slot():
+        async with queue.slot():
+            await release.wait()
+
+    running = asyncio.create_task(hold_slot())
+    waiting = asyncio.create_task(hold_slot())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HashingSaturatedError):
+        async with queue.slot():
+            pass
+
+    release.set()
+    await asyncio.gather(running, waiting)
+
+    async with queue.slot():
+        assert queue.waiting == 0
+
+
+@pytest.mark.parametrize(
+    "max_memory_mib,expected",
+    [
+        (256, Argon2Parameters(time_cost=1, memory_cost=128 * 1024, parallelism=2)),
+        (64, Argon2Parameters(time_cost=2, memory_cost=64 * 1024, parallelism=2)),
+    ],
+)
+def test_calibrate_prefers_memory_then_adds_passes(
+    max_memory_mib: int, expected: Argon2Parameters, monkeypatch
+):
+    # custo linear nas passadas e na memória: 1 passada com 64 MiB leva 100 ms
+    def fake_measure(parameters: Argon2Parameters) -> float:
+        return parameters.time_cost * parameters.memory_cost / (64 * 1024) * 100
+
+    monkeypatch.setattr(calibration, "measure_hash_time", fake_measure)
+
+    parameters = calibration.calibrate(
+        target_ms=250, max_memory_cost=max_memory_mib * 1024, parallelism=2
+    )
+
+    assert parameters == expected
+
+
+def test_write_env_file_keeps_other_variables(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("SECRET_KEY=secret\nARGON2_TIME_COST=3\n")
+
+    calibration.write_env_file(env_file, Argon2Parameters(4, 32768, 2))
+
+    assert env_file.read_text().splitlines() == [
+        "SECRET_KEY=secret",
+        "ARGON2_TIME_COST=4",
+        "ARGON2_MEMORY_COST=32768",
+        "ARGON2_PARALLELISM=2",
+    ]
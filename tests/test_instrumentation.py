@@ -0,0 +1,82 @@
+import logging
+import re
+
+from fastapi.testclient import TestClient
+import pytest
+
+from madr.core.instrumentation import get_parameters_shape
+from madr.core.settings import settings
+from madr.models import Book, User
+
+
+def get_server_timing(header: str) -> dict[str, dict[str, str]]:
+    metrics = {}
+    for metric in header.split(","):
+        name, *params = metric.strip().split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+def test_server_timing_counts_request_statements(
+    existing_book: Book, client: TestClient, queries: list[str]
+):
+    queries.clear()
+
+    response = client.get("/livro")
+
+    metrics = get_server_timing(response.headers["Server-Timing"])
+    assert metrics["db"]["desc"] == f'"{len(queries)}"'
+    assert float(metrics["db"]["dur"]) > 0
+    assert "serialize" in metrics
+
+
+def test_server_timing_measures_password_hashing(
+    existing_user: User, client: TestClient
+):
+    response = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+
+    metrics = get_server_timing(response.headers["Server-Timing"])
+    assert float(metrics["hash"]["dur"]) > 0
+
+
+def test_server_timing_measures_authentication(token: str, client: TestClient):
+    response = client.post(
+        "/livro/ids",
+        json={"ids": [1]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert "auth" not in get_server_timing(response.headers["Server-Timing"])
+
+    response = client.patch(
+        "/livro/1", json={"ano": 1900}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert "auth" in get_server_timing(response.headers["Server-Timing"])
+
+
+def test_slow_queries_are_logged_without_parameter_values(
+    existing_book: Book,
+    client: TestClient,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+
+    with caplog.at_level(logging.WARNING, logger="madr.core.instrumentation"):
+        client.get(f"/livro/isbn/{existing_book.isbn}")
+
+    assert any(
+        re.search(
+            r"consulta lenta .*FROM book\s.*\['str'\]", record.getMessage(), re.DOTALL
+        )
+        for record in caplog.records
+    )
+    assert existing_book.isbn not in caplog.text
+
+
+def test_parameters_shape_of_executemany():
+    assert (
+        get_parameters_shape([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], True)
+        == "2 x {'id': 'int', 'name': 'str'}"
+    )
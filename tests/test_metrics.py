@@ -0,0 +1,157 @@
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from madr.core import database
+from madr.core.database import ReplicaSelector, create_pooled_engine
+from madr.core.metrics import Family, Histogram, Metric, render
+from madr.core.settings import settings
+from madr.models import Book
+
+
+def get_sample(text: str, sample: str) -> float | None:
+    for line in text.splitlines():
+        if line.startswith(f"{sample} "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_count_requests_by_route_template(
+    existing_book: Book, client: TestClient
+):
+    sample = 'madr_http_requests_total{method="GET",route="/livro/{id}",status="200"}'
+    before = get_sample(client.get("/metrics").text, sample) or 0
+
+    client.get(f"/livro/{existing_book.id}")
+    client.get(f"/livro/{existing_book.id}")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert get_sample(response.text, sample) == before + 2
+    assert (
+        'madr_http_request_duration_seconds_bucket{method="GET",route="/livro/{id}",'
+        'le="+Inf"}' in response.text
+    )
+    assert get_sample(response.text, 'madr_http_requests_in_flight{method="GET"}') == 1
+
+
+def test_metrics_expose_pool_and_cache_stats(client: TestClient):
+    response = client.get("/metrics")
+
+    sample = 'madr_db_pool_checkedout{engine="primary"}'
+    assert get_sample(response.text, sample) == 0
+    assert get_sample(response.text, 'madr_cache_hit_ratio{cache="response"}') == 0
+    assert "# TYPE madr_cache_hits_total counter" in response.text
+
+
+def test_metrics_aggregate_workers_from_shared_directory(
+    tmp_path: Path, client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    other_worker = Family(
+        "madr_http_requests_total",
+        "counter",
+        "Requisições respondidas",
+        {
+            (
+                "madr_http_requests_total",
+                (("method", "GET"), ("route", "/outra"), ("status", "200")),
+            ): 3
+        },
+    )
+    (tmp_path / f"{os.getppid()}.json").write_text(
+        json.dumps(
+            [
+                {
+                    "name": other_worker.name,
+                    "type": other_worker.type,
+                    "help": other_worker.help,
+                    "samples": [
+                        [name, [list(label) for label in labels], value]
+                        for (name, labels), value in other_worker.samples.items()
+                    ],
+                }
+            ]
+        )
+    )
+
+    response = client.get("/metrics")
+
+    sample = 'madr_http_requests_total{method="GET",route="/outra",status="200"}'
+    assert get_sample(response.text, sample) == 3
+    # gauges não são somados entre os processos
+    assert 'madr_db_pool_checkedout{engine="primary",pid="' in response.text
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_metrics_expose_replica_pools(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    replica = async_sessionmaker(create_pooled_engine("sqlite+aiosqlite://"))
+    monkeypatch.setattr(database, "replica_selector", ReplicaSelector([replica]))
+
+    response = client.get("/metrics")
+
+    sample = 'madr_db_pool_checkedout{engine="replica-0"}'
+    assert get_sample(response.text, sample) == 0
+
+
+def test_metrics_skip_snapshots_of_dead_workers(
+    tmp_path: Path, client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    dead_worker = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead_worker.wait()
+    snapshot = tmp_path / f"{dead_worker.pid}.json"
+    snapshot.write_text(
+        json.dumps(
+            [
+                {
+                    "name": "madr_http_requests_total",
+                    "type": "counter",
+                    "help": "Requisições respondidas",
+                    "samples": [
+                        [
+                            "madr_http_requests_total",
+                            [["method", "GET"], ["route", "/morta"], ["status", "200"]],
+                            3,
+                        ]
+                    ],
+                }
+            ]
+        )
+    )
+
+    response = client.get("/metrics")
+
+    assert 'route="/morta"' not in response.text
+    assert not snapshot.exists()
+
+
+def test_metrics_must_implement_collect():
+    class Incomplete(Metric):
+        type = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("incompleta", "Sem coleta")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("duracao_seconds", "Duração", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    assert render([histogram.collect()]).splitlines()[2:] == [
+        'duracao_seconds_bucket{le="0.1"} 1',
+        'duracao_seconds_bucket{le="1.0"} 3',
+        'duracao_seconds_bucket{le="+Inf"} 4',
+        "duracao_seconds_count 4",
+        "duracao_seconds_sum 4.25",
+    ]
@@ -0,0 +1,137 @@
+import logging
+from typing import Any
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.orm.mapping import book_authorship_table
+from madr.core.settings import settings
+from madr.middleware import QueryPatternMiddleware
+from madr.models import Author, Book
+
+# máximo de comandos SQL por requisição no SQLite, incluindo a leitura da
+# versão do catálogo, o incremento dela nas escritas, que são dois comandos,
+# e a consulta da versão do token com o cache de autenticação vazio
+BUDGETS = [
+    ("GET", "/livro/", None, 3),
+    ("GET", "/livro/?ids={book}", None, 3),
+    ("GET", "/livro/{book}", None, 3),
+    ("GET", "/livro/isbn/{isbn}", None, 3),
+    ("GET", "/livro/export", None, 2),
+    ("POST", "/livro/ids", {"ids": ["{book}"]}, 2),
+    (
+        "POST",
+        "/livro/",
+        {
+            "isbn": "9780140449136",
+            "nome": "novo",
+            "ano": 1900,
+            "ids_romancistas": ["{author}"],
+        },
+        4,
+    ),
+    (
+        "PUT",
+        "/livro/isbn/9780140449136",
+        {"nome": "novo", "ano": 1900, "ids_romancistas": ["{author}"]},
+        5,
+    ),
+    ("PATCH", "/livro/{book}", {"ano": 1900}, 4),
+    # no Postgres a troca de romancistas é um comando a menos
+    ("PATCH", "/livro/{book}", {"ids_romancistas": ["{author}"]}, 5),
+    ("PATCH", "/livro/lote?ids={book}", {"ano": 1900}, 3),
+    ("DELETE", "/livro/lote?ids={book}", None, 4),
+    ("DELETE", "/livro/{book}", None, 3),
+    ("GET", "/romancista/", None, 2),
+    ("GET", "/romancista/?ids={author}", None, 2),
+    ("GET", "/romancista/{author}", None, 2),
+    (
+        "POST",
+        "/romancista/",
+        {"nome": "novo", "nacionalidade": "x", "data-nascimento": "2000-01-01"},
+        4,
+    ),
+    (
+        "PATCH",
+        "/romancista/{author}",
+        {"name": "outro", "nacionalidade": "y", "data-nascimento": "2000-01-01"},
+        3,
+    ),
+    ("PATCH", "/romancista/lote?ids={author}", {"nacionalidade": "y"}, 3),
+    ("DELETE", "/romancista/lote?ids={author}", None, 3),
+    ("DELETE", "/romancista/{author}", None, 3),
+]
+
+
+def fill(value: Any, ids: dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+        return ids[value[1:-1]]
+    return value
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method,url,body,budget", BUDGETS)
+async def test_route_stays_within_query_budget(
+    method: str,
+    url: str,
+    body: dict[str, Any] | None,
+    budget: int,
+    session: AsyncSession,
+    existing_book: Book,
+    existing_author: Author,
+    token: str,
+    client: TestClient,
+    query_budget,
+):
+    await session.execute(
+        insert(book_authorship_table).values(
+            book_id=existing_book.id, author_id=existing_author.id
+        )
+    )
+    await session.commit()
+    ids = {
+        "book": existing_book.id,
+        "author": existing_author.id,
+        "isbn": existing_book.isbn,
+    }
+
+    with query_budget(budget):
+        response = client.request(
+            method,
+            url.format(**ids),
+            json=fill(body, ids),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert response.status_code < 400
+
+
+def test_repeated_statements_are_logged_as_n_plus_one(
+    session: AsyncSession,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 3)
+    app = FastAPI()
+
+    @app.get("/")
+    async def n_plus_one():
+        for ids in ([1], [1, 2], [1, 2, 3]):
+            await session.execute(
+                select(book_authorship_table).filter(
+                    book_authorship_table.c.book_id.in_(ids)
+                )
+            )
+
+    with caplog.at_level(logging.WARNING, logger="madr.middleware"):
+        TestClient(QueryPatternMiddleware(app)).get("/")
+
+    assert "comando repetido 3 vezes em GET /" in caplog.text
+    assert "IN (?)" in caplog.text
@@ -0,0 +1,180 @@
+import os
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Connection, create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from madr.app import app
+from madr.core.database import get_async_session, get_session_maker
+from madr.core.orm.mapping import init_mappings, mapping_registry, remove_mappings
+from madr.core.security import create_access_token
+from madr.utils.caching import response_cache
+
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URI, reason="TEST_DATABASE_URI não configurada"
+)
+
+BOOKS = 20_000
+AUTHORS = 2_000
+
+# varreduras sequenciais só são aceitas em tabelas pequenas
+SEQ_SCAN_MAX_ROWS = 1_000
+
+# o WITH cobre a troca de romancistas, que remove e insere no mesmo comando
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# uma entrada para cada forma de consulta emitida pelas rotas
+ROUTES = [
+    ("GET", "/livro/?limite=20", None),
+    ("GET", "/livro/?nome=Livro 1234", None),
+    ("GET", "/livro/?busca=livro", None),
+    ("GET", "/livro/?ano-inicial=1990&ano-final=1991", None),
+    ("GET", "/livro/?ids=1,500,19999", None),
+    ("GET", "/livro/?ordenar=ano,-nome&limite=20", None),
+    ("GET", "/livro/?ordenar=-ano", None),
+    ("GET", "/livro/500", None),
+    ("GET", "/livro/isbn/9780140449136", None),
+    ("PATCH", "/livro/500", {"ids_romancistas": [1, 2]}),
+    ("PATCH", "/livro/lote?ano-inicial=1990&ano-final=1990", {"ano": 1990}),
+    ("GET", "/romancista/?limite=20", None),
+    ("GET", "/romancista/?nome=Romancista 12", None),
+    ("GET", "/romancista/?ids=1,500,1999", None),
+    ("GET", "/romancista/?ordenar=nacionalidade", None),
+    ("GET", "/romancista/?ordenar=-nome", None),
+    ("GET", "/romancista/500", None),
+    ("DELETE", "/romancista/lote?ids=1999", None),
+]
+
+
+def seed(connection: Connection) -> None:
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    mapping_registry.metadata.drop_all(connection)
+    mapping_registry.metadata.create_all(connection)
+
+    connection.execute(
+        text(
+            "INSERT INTO author (name, nationality, birth_date) "
+            "SELECT 'Romancista ' || n, 'brasileira', DATE '1900-01-01' + n "
+            "FROM generate_series(1, :authors) AS n"
+        ),
+        {"authors": AUTHORS},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO book (name, year) "
+            "SELECT 'Livro ' || n, 1900 + n % 120 FROM generate_series(1, :books) AS n"
+        ),
+        {"books": BOOKS},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO book_authorship (book_id, author_id) "
+            "SELECT n, 1 + n % :authors FROM generate_series(1, :books) AS n"
+        ),
+        {"books": BOOKS, "authors": AUTHORS},
+    )
+    connection.execute(
+        text(
+            'INSERT INTO "user" (id, name, email, password) '
+            "VALUES (gen_random_uuid(), 'teste', 'teste@teste.com', 'x')"
+        )
+    )
+    connection.execute(text("ANALYZE"))
+
+
+@pytest.fixture(scope="module")
+def database() -> Iterator[Connection]:
+    engine = create_engine(TEST_DATABASE_URI)
+
+    with engine.begin() as connection:
+        seed(connection)
+
+    with engine.connect() as connection:
+        yield connection
+
+    engine.dispose()
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    # conexões assíncronas não podem ser reaproveitadas entre os event loops
+    # de cada TestClient
+    engine = create_async_engine(TEST_DATABASE_URI, poolclass=NullPool)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def session_override():
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = session_override
+    app.dependency_overrides[get_session_maker] = lambda: sessionmaker
+    response_cache.clear()
+    init_mappings()
+
+    client = TestClient(app)
+    client.statements = []  # type: ignore[attr-defined]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        client.statements.append((statement, parameters))  # type: ignore[attr-defined]
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield client
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    remove_mappings()
+    app.dependency_overrides.clear()
+
+
+def get_seq_scans(plan: dict[str, Any]) -> Iterator[str]:
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from get_seq_scans(child)
+
+
+def get_table_rows(database: Connection, table: str) -> int:
+    return database.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+        {"table": table},
+    ).scalar_one()
+
+
+@pytest.mark.parametrize("method,url,body", ROUTES)
+def test_route_queries_do_not_scan_large_tables(
+    method: str,
+    url: str,
+    body: dict[str, Any] | None,
+    database: Connection,
+    client: TestClient,
+):
+    user_id = database.execute(text('SELECT id FROM "user"')).scalar_one()
+    token = create_access_token(
+        {"sub": "teste@teste.com", "uid": str(user_id), "ver": 0}
+    )
+
+    response = client.request(
+        method, url, json=body, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code < 500
+
+    for statement, parameters in client.statements:  # type: ignore[attr-defined]
+        if not statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+
+        # EXPLAIN sem ANALYZE não executa o comando
+        plan = database.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar_one()[0]["Plan"]
+
+        large_scans = [
+            table
+            for table in get_seq_scans(plan)
+            if get_table_rows(database, table) > SEQ_SCAN_MAX_ROWS
+        ]
+        assert not large_scans, f"{statement}\n{plan}"
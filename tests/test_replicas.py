@@ -0,0 +1,132 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from madr.app import app
+from madr.core import database
+from madr.core.database import ReplicaSelector, TimedQueuePool, get_session_maker
+from madr.core.orm.mapping import author_table, mapping_registry
+from madr.deps import get_read_session
+from madr.models import User
+from tests.factories import AuthorCreateFactory
+
+
+async def create_database(path: Path, author_name: str) -> async_sessionmaker:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=TimedQueuePool
+    )
+    async with engine.begin() as connection:
+        await connection.run_sync(mapping_registry.metadata.create_all)
+        await connection.execute(
+            insert(author_table).values(
+                AuthorCreateFactory.create(name=author_name).model_dump()
+            )
+        )
+    return async_sessionmaker(engine)
+
+
+@pytest_asyncio.fixture
+async def replicated(
+    tmp_path: Path, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> AsyncIterator[async_sessionmaker]:
+    primary = await create_database(tmp_path / "primario.db", "Primário")
+    replica = await create_database(tmp_path / "replica.db", "Réplica")
+    monkeypatch.setattr(database, "replica_selector", ReplicaSelector([replica]))
+    yield primary
+    for maker in (primary, replica):
+        await maker.kw["bind"].dispose()
+
+
+@pytest.fixture
+def replicated_client(replicated: async_sessionmaker, client: TestClient) -> TestClient:
+    app.dependency_overrides.pop(get_read_session)
+    app.dependency_overrides[get_session_maker] = lambda: replicated
+    return client
+
+
+def get_author_names(client: TestClient, **kwargs) -> list[str]:
+    return [author["nome"] for author in client.get("/romancista", **kwargs).json()]
+
+
+def test_reads_go_to_replica(replicated_client: TestClient):
+    assert get_author_names(replicated_client) == ["Réplica"]
+
+
+def test_reads_after_a_write_go_to_primary(replicated_client: TestClient):
+    replicated_client.cookies.set("read_primary", "1")
+
+    assert get_author_names(replicated_client) == ["Primário"]
+
+
+def test_read_primary_header_goes_to_primary(replicated_client: TestClient):
+    names = get_author_names(replicated_client, headers={"X-Read-Primary": "1"})
+
+    assert names == ["Primário"]
+
+
+def test_writes_mark_the_client_to_read_from_primary(
+    replicated: async_sessionmaker, token: str, client: TestClient
+):
+    response = client.post(
+        "/romancista",
+        json=AuthorCreateFactory.create().model_dump(by_alias=True, mode="json"),
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 201
+    assert response.cookies["read_primary"] == "1"
+
+
+def test_read_only_posts_set_no_cookie(
+    replicated: async_sessionmaker, existing_user: User, client: TestClient
+):
+    login = client.post(
+        "/token", data={"username": existing_user.email, "password": "password"}
+    )
+    many = client.post("/livro/ids", json={"ids": [1]})
+
+    assert login.status_code == many.status_code == 200
+    assert "read_primary" not in login.cookies
+    assert "read_primary" not in many.cookies
+
+
+def test_current_user_is_checked_against_primary(
+    replicated_client: TestClient, token: str
+):
+    # a réplica não tem o usuário
+    response = replicated_client.get(
+        "/conta/minha-conta", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+
+
+def test_writes_without_replicas_set_no_cookie(token: str, client: TestClient):
+    response = client.post(
+        "/romancista",
+        json=AuthorCreateFactory.create().model_dump(by_alias=True, mode="json"),
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert "read_primary" not in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_replica_selector_prefers_the_least_busy(tmp_path: Path):
+    first = await create_database(tmp_path / "primeira.db", "Primeira")
+    second = await create_database(tmp_path / "segunda.db", "Segunda")
+    selector = ReplicaSelector([first, second])
+
+    # ociosas, as réplicas se alternam
+    assert [selector.choose() for _ in range(4)] == [first, second, first, second]
+
+    async with first.kw["bind"].connect():
+        assert [selector.choose() for _ in range(2)] == [second, second]
+
+    for maker in (first, second):
+        await maker.kw["bind"].dispose()
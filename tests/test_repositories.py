@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.orm.mapping import book_authorship_table, book_table
+from madr.models import Author, Book
+from madr.repositories.authors import AuthorRow, fetch_author
+from madr.repositories.books import (
+    BookRow,
+    book_json_object,
+    fetch_book,
+    fetch_books,
+    json_array,
+    select_books,
+)
+
+
+def test_book_json_object_aggregates_authors_in_postgres():
+    query = select(book_table.c.id, book_json_object())
+
+    compiled = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "json_build_object" in compiled
+    assert "json_agg(author.name ORDER BY author.id)" in compiled
+    assert "book_authorship.book_id = book.id" in compiled
+    assert "CAST(" in compiled
+
+
+def test_json_array_joins_objects_verbatim():
+    body = json_array(['{"id" : 1, "nome" : "a"}', '{"id" : 2, "nome" : "b"}'])
+
+    assert json.loads(body) == [{"id": 1, "nome": "a"}, {"id": 2, "nome": "b"}]
+    assert json_array([]) == b"[]"
+
+
+@pytest.mark.asyncio
+async def test_fetch_books_returns_rows_outside_identity_map(
+    session: AsyncSession,
+    existing_book: Book,
+    another_book: Book,
+    existing_author: Author,
+    another_author: Author,
+):
+    await session.execute(
+        insert(book_authorship_table),
+        [
+            {"book_id": existing_book.id, "author_id": another_author.id},
+            {"book_id": existing_book.id, "author_id": existing_author.id},
+        ],
+    )
+    session.expunge_all()
+
+    rows = await fetch_books(session, select_books().order_by(book_table.c.id))
+
+    assert rows == [
+        BookRow(
+            existing_book.id,
+            existing_book.isbn,
+            existing_book.name,
+            existing_book.year,
+            [existing_author.name, another_author.name],
+        ),
+        BookRow(
+            another_book.id, another_book.isbn, another_book.name, another_book.year, []
+        ),
+    ]
+    assert not session.identity_map
+
+
+@pytest.mark.asyncio
+async def test_fetch_one_missing_returns_none(session: AsyncSession):
+    assert await fetch_book(session, 1) is None
+    assert await fetch_author(session, 1) is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_author(session: AsyncSession, existing_author: Author):
+    assert await fetch_author(session, existing_author.id) == AuthorRow(
+        existing_author.id,
+        existing_author.name,
+        existing_author.nationality,
+        existing_author.birth_date,
+    )
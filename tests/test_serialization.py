@@ -0,0 +1,39 @@
+import json
+from datetime import date
+
+from madr.models import Author, Book
+from madr.utils.serialization import (
+    author_list_adapter,
+    book_list_adapter,
+    dump_json_list,
+)
+
+
+def test_dump_json_list_reads_books_from_attributes():
+    book = Book(
+        isbn="9780306406157",
+        name="dom casmurro",
+        year=1899,
+        authors=[
+            Author(
+                name="machado de assis",
+                nationality="brasileira",
+                birth_date=date(1839, 6, 21),
+            )
+        ],
+    )
+    book.id = 1
+
+    assert json.loads(dump_json_list(book_list_adapter, [book])) == [
+        {
+            "id": 1,
+            "isbn": "9780306406157",
+            "nome": "dom casmurro",
+            "ano": 1899,
+            "authors_names": ["machado de assis"],
+        }
+    ]
+
+
+def test_dump_json_list_empty():
+    assert dump_json_list(author_list_adapter, []) == b"[]"
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from madr.app import app
+from madr.core.database import (
+    TimedQueuePool,
+    get_pool_stats,
+    get_session_maker,
+    warm_up_pool,
+)
+
+
+def test_readiness_checks_the_database(client: TestClient):
+    response = client.get("/status/pronto")
+
+    assert response.status_code == 200
+    assert response.json()["banco"] == "ok"
+
+
+def test_readiness_fails_when_database_is_unavailable(
+    tmp_path: Path, client: TestClient
+):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ausente/madr.db")
+    app.dependency_overrides[get_session_maker] = lambda: async_sessionmaker(engine)
+
+    response = client.get("/status/pronto")
+
+    assert response.status_code == 503
+    assert response.json()["banco"] == "indisponível"
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_pool_connections(tmp_path: Path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/madr.db", poolclass=TimedQueuePool, pool_size=3
+    )
+
+    await warm_up_pool(engine, 5)
+
+    assert get_pool_stats(engine)["checkedin"] == 3
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_tolerates_unavailable_database(tmp_path: Path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/ausente/madr.db", poolclass=TimedQueuePool
+    )
+
+    await warm_up_pool(engine, 2)
+
+    assert get_pool_stats(engine)["checkedin"] == 0